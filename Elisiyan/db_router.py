@@ -0,0 +1,115 @@
+"""
+Read-replica routing.
+
+Replicas are configured with DATABASE_REPLICA_URLS and become the
+``replica_0``, ``replica_1``, ... aliases. Nothing is sent to them unless a
+view opts in. ``ReplicaReadMixin`` marks a DRF view's read-only actions,
+and only the queries those actions run go to a random replica. Every
+other read, and every write, uses ``default``.
+
+Read-your-writes: after a successful unsafe request,
+``ReadYourWritesMiddleware`` pins the client to the primary for
+DATABASE_REPLICA_PIN_SECONDS. The pin is a cookie plus, for authenticated
+users, a cache entry, so token clients that ignore cookies are covered
+too. Without the pin, a client could miss its own review on the very next
+page while the replica catches up.
+
+Replica lag also affects the catalog response cache. A listing read from
+a lagging replica just after a catalog change is cached under the new
+catalog version. Keep replicas close, or keep CATALOG_CACHE_TIMEOUT short,
+when that matters.
+"""
+import contextvars
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+
+_use_replica = contextvars.ContextVar("use_replica", default=False)
+
+PIN_COOKIE = "db_pin"
+UNSAFE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias.startswith("replica_")]
+
+
+def pin_seconds():
+    return getattr(settings, "DATABASE_REPLICA_PIN_SECONDS", 5)
+
+
+def pin_cache_key(user_id):
+    return f"db:pin:{user_id}"
+
+
+def is_pinned(request):
+    if request.COOKIES.get(PIN_COOKIE):
+        return True
+    user = getattr(request, "user", None)
+    return bool(user is not None and user.is_authenticated and cache.get(pin_cache_key(user.pk)))
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_replica.get():
+            replicas = replica_aliases()
+            if replicas:
+                return random.choice(replicas)
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
+
+
+class ReplicaReadMixin:
+    """
+    Send the queries of ``replica_actions`` to a read replica, unless the
+    client has written recently. Safe methods only, plus POSTs to
+    ``read_only_post_actions``, which also don't pin the client.
+    """
+
+    replica_actions = ()
+    # POST actions that only read, e.g. lookups whose parameters don't fit in a URL.
+    read_only_post_actions = ()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        read_only = request.method in ("GET", "HEAD") or (
+            request.method == "POST" and self.action in self.read_only_post_actions
+        )
+        if read_only:
+            request._request.db_read_only = True
+        # Runs after authentication, so a pinned token user is recognised.
+        if read_only and self.action in self.replica_actions and not is_pinned(request):
+            self._replica_token = _use_replica.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, "_replica_token", None)
+        if token is not None:
+            _use_replica.reset(token)
+            self._replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class ReadYourWritesMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method in UNSAFE_METHODS and not getattr(request, "db_read_only", False) \
+                and response.status_code < 400 and replica_aliases():
+            seconds = pin_seconds()
+            response.set_cookie(PIN_COOKIE, "1", max_age=seconds, httponly=True, samesite="Lax")
+            user = getattr(request, "user", None)
+            if user is not None and user.is_authenticated:
+                cache.set(pin_cache_key(user.pk), True, seconds)
+        return response
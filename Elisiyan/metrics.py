@@ -0,0 +1,310 @@
+"""
+Per-request latency and SQL instrumentation, exported in the Prometheus
+text format at /metrics.
+
+Each process keeps its own counters and histograms in memory and
+periodically writes a snapshot to ``METRICS_DIR/metrics-<pid>.json``. The
+/metrics view merges every snapshot in that directory, so a scrape that
+lands on any gunicorn worker reports the totals of all of them. A worker
+removes its own snapshot when it exits, and the view drops the snapshots
+of processes that are no longer running (a killed worker), so the
+directory only holds live workers. Totals therefore drop when a worker
+goes away, which Prometheus treats as a counter reset.
+
+SQL run while a streamed response is being consumed is counted too: for a
+streaming response the request is recorded once its content is exhausted.
+
+/metrics needs ``Authorization: Bearer <METRICS_TOKEN>`` when a token is
+configured, and a logged-in staff session otherwise.
+"""
+import atexit
+import hmac
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+HELP = {
+    "http_requests_total": ("counter", "Requests handled, by view, method and status."),
+    "http_request_duration_seconds": ("histogram", "Time spent producing the response, by view."),
+    "db_queries_per_request": ("histogram", "SQL queries executed per request, by view."),
+    "db_query_duration_seconds": ("histogram", "Total SQL time per request, by view."),
+    "db_duplicate_queries_total": ("counter", "Requests that repeated the same SQL statement, by view."),
+    "auth_token_cache_total": ("counter", "Token authentications, by cache tier that answered (or miss)."),
+    "fragment_cache_total": ("counter", "Items in list responses, by whether their pre-encoded JSON was reused (hit) or serialized (miss)."),
+}
+
+
+def metrics_dir():
+    return getattr(settings, "METRICS_DIR", None) or os.path.join(tempfile.gettempdir(), "elisiyan-metrics")
+
+
+def snapshot_path(pid):
+    return os.path.join(metrics_dir(), f"metrics-{pid}.json")
+
+
+def mark_process_dead(pid):
+    """Remove a process's snapshot; also usable from gunicorn's ``child_exit`` hook."""
+    try:
+        os.remove(snapshot_path(pid))
+    except FileNotFoundError:
+        pass
+    except OSError:
+        logger.warning("Could not remove metrics snapshot of process %s", pid, exc_info=True)
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.last_flush = 0.0
+
+    @staticmethod
+    def key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, amount=1, **labels):
+        key = self.key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = self.key(name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {"buckets": list(buckets), "counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+            for index, bound in enumerate(histogram["buckets"]):
+                if value <= bound:
+                    histogram["counts"][index] += 1
+                    break
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "counters": [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                "histograms": [
+                    [name, list(labels), dict(histogram, counts=list(histogram["counts"]))]
+                    for (name, labels), histogram in self.histograms.items()
+                ],
+            }
+
+    def flush(self, force=False):
+        """Write this process's snapshot for the /metrics view of any worker to read."""
+        now = time.monotonic()
+        interval = getattr(settings, "METRICS_FLUSH_INTERVAL", 5.0)
+        if not force and now - self.last_flush < interval:
+            return
+        self.last_flush = now
+        directory = metrics_dir()
+        try:
+            os.makedirs(directory, exist_ok=True)
+            path = snapshot_path(os.getpid())
+            fd, temporary = tempfile.mkstemp(dir=directory, prefix=".metrics-")
+            with os.fdopen(fd, "w") as output:
+                json.dump(self.snapshot(), output)
+            os.replace(temporary, path)
+        except OSError:
+            logger.warning("Could not write metrics snapshot to %s", directory, exc_info=True)
+
+
+registry = Registry()
+inc = registry.inc
+observe = registry.observe
+atexit.register(lambda: mark_process_dead(os.getpid()))
+
+
+def merged_snapshots():
+    counters, histograms = Counter(), {}
+    directory = metrics_dir()
+    try:
+        names = [name for name in os.listdir(directory) if name.startswith("metrics-") and name.endswith(".json")]
+    except OSError:
+        names = []
+    for name in names:
+        try:
+            pid = int(name[len("metrics-"):-len(".json")])
+        except ValueError:
+            continue
+        if pid != os.getpid() and not process_alive(pid):
+            mark_process_dead(pid)
+            continue
+        try:
+            with open(os.path.join(directory, name)) as snapshot_file:
+                snapshot = json.load(snapshot_file)
+        except (OSError, ValueError):
+            continue
+        for metric, labels, value in snapshot["counters"]:
+            counters[metric, tuple(map(tuple, labels))] += value
+        for metric, labels, histogram in snapshot["histograms"]:
+            key = metric, tuple(map(tuple, labels))
+            merged = histograms.get(key)
+            if merged is None or merged["buckets"] != histogram["buckets"]:
+                histograms[key] = histogram
+                continue
+            merged["counts"] = [a + b for a, b in zip(merged["counts"], histogram["counts"])]
+            merged["sum"] += histogram["sum"]
+            merged["count"] += histogram["count"]
+    return counters, histograms
+
+
+def format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+
+def render_prometheus(counters, histograms):
+    lines = []
+    described = set()
+
+    def describe(name, default_type):
+        if name not in described:
+            described.add(name)
+            metric_type, help_text = HELP.get(name, (default_type, name))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+
+    for (name, labels), value in sorted(counters.items()):
+        describe(name, "counter")
+        lines.append(f"{name}{format_labels(labels)} {value}")
+    for (name, labels), histogram in sorted(histograms.items()):
+        describe(name, "histogram")
+        cumulative = 0
+        for bound, count in zip(histogram["buckets"], histogram["counts"]):
+            cumulative += count
+            lines.append(f"{name}_bucket{format_labels(labels, [('le', bound)])} {cumulative}")
+        lines.append(f"{name}_bucket{format_labels(labels, [('le', '+Inf')])} {histogram['count']}")
+        lines.append(f"{name}_sum{format_labels(labels)} {histogram['sum']}")
+        lines.append(f"{name}_count{format_labels(labels)} {histogram['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def metrics_allowed(request):
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if token:
+        return hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}")
+    user = getattr(request, "user", None)
+    return bool(user is not None and user.is_active and user.is_staff)
+
+
+def metrics_view(request):
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+    registry.flush(force=True)
+    return HttpResponse(render_prometheus(*merged_snapshots()), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+class QueryRecorder:
+    """``execute_wrapper`` hook that counts and times every SQL statement."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.statements[sql] += 1
+
+    def duplicates(self, threshold):
+        return {sql: count for sql, count in self.statements.items() if count >= threshold}
+
+
+class RequestMetricsMiddleware:
+    """
+    Record latency, SQL count and SQL time per view, flag requests that run
+    the same statement repeatedly (the usual N+1 signature) and report the
+    timings to the client in a ``Server-Timing`` header. A streaming
+    response is recorded when its content has been consumed, and gets no
+    ``Server-Timing`` since its headers go out before the timings are known.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    @staticmethod
+    def recording(recorder):
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(recorder))
+        return stack
+
+    def __call__(self, request):
+        if request.path == "/metrics":
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with self.recording(recorder):
+            response = self.get_response(request)
+
+        if response.streaming and not response.is_async:
+            response.streaming_content = self.recorded_stream(
+                response.streaming_content, request, response, recorder, start
+            )
+            return response
+        duration = time.perf_counter() - start
+        duplicates = self.record(request, response, recorder, duration)
+        response["Server-Timing"] = ", ".join([
+            f"app;dur={duration * 1000:.1f}",
+            f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries"',
+        ] + ([f'dupq;desc="{sum(duplicates.values())} repeated"'] if duplicates else []))
+        return response
+
+    def recorded_stream(self, content, request, response, recorder, start):
+        try:
+            with self.recording(recorder):
+                yield from content
+        finally:
+            self.record(request, response, recorder, time.perf_counter() - start)
+
+    def record(self, request, response, recorder, duration):
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match else "unresolved"
+        inc("http_requests_total", view=view, method=request.method, status=response.status_code)
+        observe("http_request_duration_seconds", duration, view=view)
+        observe("db_queries_per_request", recorder.count, buckets=QUERY_COUNT_BUCKETS, view=view)
+        observe("db_query_duration_seconds", recorder.duration, view=view)
+
+        duplicates = recorder.duplicates(getattr(settings, "METRICS_DUPLICATE_QUERY_THRESHOLD", 3))
+        if duplicates:
+            inc("db_duplicate_queries_total", view=view)
+            sql, count = max(duplicates.items(), key=lambda item: item[1])
+            logger.warning("%s %s ran the same query %d times: %s", request.method, request.path, count, sql[:300])
+
+        registry.flush()
+        return duplicates
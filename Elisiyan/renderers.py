@@ -0,0 +1,110 @@
+"""
+orjson-backed JSON rendering and parsing for the whole API.
+
+DRF's JSONRenderer and JSONParser run on the stdlib ``json`` module. Its
+encoder is pure Python for every value that is not a plain str or number,
+and it calls ``JSONEncoder.default`` for each datetime and Decimal.
+orjson encodes dicts, lists, strings, numbers, datetimes, dates, times and
+UUIDs in C. Only the few remaining types reach ``default()`` below, and
+that produces what DRF's encoder would:
+
+- Decimal as a float (serializer fields already return prices as strings)
+- lazy translation strings, timedeltas and querysets as DRF's encoder does
+- a FieldFile or ImageFieldFile as its URL, or null without a file (DRF's
+  encoder would iterate over the file's contents)
+
+Other behaviour that matches DRF: the output is compact and UTF-8,
+datetimes in UTC end in ``Z``, and U+2028/U+2029 are escaped. Indented
+output (the browsable API, ``Accept: application/json; indent=4``) is
+rare, and orjson only indents by two, so it goes through the stdlib path.
+
+``NDJSONRenderer`` writes one JSON document per line. For a paginated
+response it writes the results, and the next page's URL goes in a
+``Link`` header.
+"""
+import decimal
+
+import orjson
+from django.conf import settings
+from django.db.models.fields.files import FieldFile
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+class JSONEncoder(encoders.JSONEncoder):
+    """DRF's encoder, with files written as their URL. Also used for indented output."""
+
+    def default(self, obj):
+        if isinstance(obj, FieldFile):
+            return obj.url if obj.name else None
+        return super().default(obj)
+
+
+_encoder = JSONEncoder()
+
+
+def default(obj):
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    return _encoder.default(obj)
+
+
+def dumps(data):
+    """Compact UTF-8 JSON bytes for ``data``, as DRF's JSONRenderer would write them."""
+    encoded = orjson.dumps(data, default=default, option=OPTIONS)
+    if b"\xe2\x80\xa8" in encoded or b"\xe2\x80\xa9" in encoded:
+        encoded = encoded.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+    return encoded
+
+
+class ORJSONRenderer(JSONRenderer):
+    encoder_class = JSONEncoder
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+class ORJSONParser(BaseParser):
+    media_type = "application/json"
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        try:
+            body = stream.read() if stream is not None else b""
+            if encoding.lower().replace("-", "") != "utf8":
+                body = body.decode(encoding)
+            return orjson.loads(body)
+        except (ValueError, LookupError) as exc:
+            raise ParseError("JSON parse error - %s" % str(exc))
+
+
+class NDJSONRenderer(ORJSONRenderer):
+    media_type = NDJSON_MEDIA_TYPE
+    format = "ndjson"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        renderer_context = renderer_context or {}
+        response = renderer_context.get("response")
+        if isinstance(data, dict) and "results" in data and response is not None and not response.exception:
+            if data.get("next"):
+                response["Link"] = f'<{data["next"]}>; rel="next"'
+            data = data["results"]
+        if isinstance(data, (list, tuple)):
+            return self.encode_rows(data)
+        return dumps(data) + b"\n"
+
+    def encode_rows(self, rows):
+        return b"".join(dumps(row) + b"\n" for row in rows)
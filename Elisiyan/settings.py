@@ -1,5 +1,6 @@
 import os
 from pathlib import Path
+import dj_database_url
 import environ
 env = environ.Env()
 environ.Env.read_env()
@@ -41,6 +42,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'Elisiyan.metrics.RequestMetricsMiddleware',
+    'Elisiyan.db_router.ReadYourWritesMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -78,11 +81,60 @@ WSGI_APPLICATION = 'Elisiyan.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# DATABASE_URL selects the primary (SQLite in the project directory by default);
+# DATABASE_REPLICA_URLS, comma separated, adds read replicas used by the
+# catalog read endpoints (see Elisiyan/db_router.py). PostgreSQL connections
+# come from psycopg's pool (psycopg[pool] in requirements.txt) unless
+# DATABASE_POOL=false, which keeps persistent connections instead.
+DATABASE_CONN_MAX_AGE = env.int("DATABASE_CONN_MAX_AGE", default=60)
+DATABASE_POOL = env.bool("DATABASE_POOL", default=True)
+DATABASE_POOL_MIN_SIZE = env.int("DATABASE_POOL_MIN_SIZE", default=2)
+DATABASE_POOL_MAX_SIZE = env.int("DATABASE_POOL_MAX_SIZE", default=10)
+DATABASE_REPLICA_PIN_SECONDS = env.int("DATABASE_REPLICA_PIN_SECONDS", default=5)
+
+# Single-node SQLite: IMMEDIATE transactions take the write lock up front
+# instead of failing on upgrade. SQLITE_WAL=true also lets readers run
+# alongside the writer; it is opt-in because WAL mode is stored in the
+# database file itself (and adds -wal/-shm files next to it).
+SQLITE_WAL = env.bool("SQLITE_WAL", default=False)
+SQLITE_INIT_COMMAND = (
+    ("PRAGMA journal_mode=WAL;PRAGMA synchronous=NORMAL;" if SQLITE_WAL else "")
+    + "PRAGMA temp_store=MEMORY;"
+    "PRAGMA mmap_size=134217728;"
+    "PRAGMA cache_size=-20000;"
+)
+
+
+def database_config(url):
+    config = dj_database_url.parse(url, conn_max_age=DATABASE_CONN_MAX_AGE, conn_health_checks=True)
+    options = config.setdefault('OPTIONS', {})
+    if config['ENGINE'] == 'django.db.backends.sqlite3':
+        options.setdefault('init_command', SQLITE_INIT_COMMAND)
+        options.setdefault('transaction_mode', 'IMMEDIATE')
+        options.setdefault('timeout', 20)
+    elif config['ENGINE'] == 'django.db.backends.postgresql' and DATABASE_POOL:
+        # psycopg's pool replaces persistent connections; Django refuses both at once.
+        config['CONN_MAX_AGE'] = 0
+        options['pool'] = {'min_size': DATABASE_POOL_MIN_SIZE, 'max_size': DATABASE_POOL_MAX_SIZE}
+    return config
+
+
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_config(env("DATABASE_URL", default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}")),
+}
+for index, url in enumerate(env.list("DATABASE_REPLICA_URLS", default=[])):
+    DATABASES[f'replica_{index}'] = database_config(url)
+    DATABASES[f'replica_{index}']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['Elisiyan.db_router.ReplicaRouter']
+
+
+# Cache
+# CACHE_URL selects the backend, e.g. redis://127.0.0.1:6379/1 to share the
+# catalog cache between workers or filecache:///var/tmp/elisiyan for a single host.
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
 }
 
 
@@ -130,10 +182,87 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
+# Catalog listing
+CATALOG_PAGE_SIZE = env.int("CATALOG_PAGE_SIZE", default=24)
+CATALOG_MAX_PAGE_SIZE = env.int("CATALOG_MAX_PAGE_SIZE", default=100)
+CATALOG_CACHE_TIMEOUT = env.int("CATALOG_CACHE_TIMEOUT", default=3600)
+# Memory-mapped listing snapshot shared by the workers of one host (see products/snapshot.py).
+# Each database gets its own subdirectory.
+CATALOG_SNAPSHOT_ENABLED = env.bool("CATALOG_SNAPSHOT_ENABLED", default=True)
+CATALOG_SNAPSHOT_DIR = env("CATALOG_SNAPSHOT_DIR", default=str(BASE_DIR / 'var' / 'catalog-snapshot'))
+
+# Product image variants (see products/images.py)
+IMAGE_VARIANT_WIDTHS = (200, 400, 800)
+IMAGE_VARIANT_FORMATS = tuple(env.list("IMAGE_VARIANT_FORMATS", default=["webp", "jpeg"]))
+IMAGE_VARIANT_WORKERS = env.int("IMAGE_VARIANT_WORKERS", default=2)
+
+# Request metrics (see Elisiyan/metrics.py). METRICS_DIR must be shared by all
+# workers of one server; METRICS_TOKEN, when set, is required as a Bearer token,
+# otherwise /metrics is only served to staff sessions.
+METRICS_DIR = env("METRICS_DIR", default=None)
+METRICS_TOKEN = env("METRICS_TOKEN", default="")
+METRICS_DUPLICATE_QUERY_THRESHOLD = 3
+
+# Buffered popularity counters, kept in the cache until flushed (see products/popularity.py)
+POPULARITY_FLUSH_INTERVAL = env.float("POPULARITY_FLUSH_INTERVAL", default=5.0)
+# Events lose half their weight in sort_by=trending after this many hours (see products/trending.py)
+TRENDING_HALF_LIFE_HOURS = env.float("TRENDING_HALF_LIFE_HOURS", default=72.0)
+
+# Neighbours stored per item by build_recommendations (see products/recommendations.py)
+RECOMMENDATION_TOP_K = env.int("RECOMMENDATION_TOP_K", default=12)
+# Content-based similar items (see products/similarity.py)
+SIMILARITY_TOP_K = env.int("SIMILARITY_TOP_K", default=12)
+SIMILARITY_MAX_TERMS = env.int("SIMILARITY_MAX_TERMS", default=5000)
+# Where the index is saved for every worker to load; shared by the workers of one server.
+# Each database gets its own subdirectory.
+SIMILARITY_INDEX_DIR = env("SIMILARITY_INDEX_DIR", default=str(BASE_DIR / 'var' / 'similarity-index'))
+# Autocomplete index: full rebuild interval, to pick up popularity (see products/suggest.py)
+SUGGEST_REFRESH_SECONDS = env.int("SUGGEST_REFRESH_SECONDS", default=300)
+# Per-worker budget for pre-encoded item JSON (see products/fragments.py)
+FRAGMENT_CACHE_BYTES = env.int("FRAGMENT_CACHE_BYTES", default=32 * 1024 * 1024)
+
+# Token authentication cache (see users/authentication.py). The shared tier and
+# AUTH_TOKEN_LOCAL_TTL only apply with a shared CACHE_URL (Redis, memcached);
+# with the per-process default, local entries live AUTH_TOKEN_UNSHARED_LOCAL_TTL seconds.
+AUTH_TOKEN_CACHE_TIMEOUT = env.int("AUTH_TOKEN_CACHE_TIMEOUT", default=300)
+AUTH_TOKEN_LOCAL_TTL = env.int("AUTH_TOKEN_LOCAL_TTL", default=60)
+AUTH_TOKEN_UNSHARED_LOCAL_TTL = env.float("AUTH_TOKEN_UNSHARED_LOCAL_TTL", default=1.0)
+AUTH_TOKEN_LOCAL_CACHE_SIZE = env.int("AUTH_TOKEN_LOCAL_CACHE_SIZE", default=1024)
+
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'users.authentication.CachedTokenAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+    ],
+    # orjson-backed JSON, plus NDJSON on request (see Elisiyan/renderers.py)
+    'DEFAULT_RENDERER_CLASSES': [
+        'Elisiyan.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'Elisiyan.renderers.NDJSONRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'Elisiyan.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
+# Rows serialized per chunk by the streaming admin list endpoints
+STREAMING_CHUNK_SIZE = env.int("STREAMING_CHUNK_SIZE", default=500)
+
 
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# Set EMAIL_BACKEND to the console or file backend (with EMAIL_FILE_PATH) to try send_outbox locally.
+EMAIL_BACKEND = env("EMAIL_BACKEND", default='django.core.mail.backends.smtp.EmailBackend')
+EMAIL_FILE_PATH = env("EMAIL_FILE_PATH", default=str(BASE_DIR / 'sent_emails'))
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_USE_TLS = True
 EMAIL_PORT = 587
-EMAIL_HOST_USER =env("EMAIL")
-EMAIL_HOST_PASSWORD = env("EMAIL_PASSWORD")
\ No newline at end of file
+EMAIL_TIMEOUT = env.int("EMAIL_TIMEOUT", default=20)
+EMAIL_HOST_USER =env("EMAIL", default="")
+EMAIL_HOST_PASSWORD = env("EMAIL_PASSWORD", default="")
+
+# Outbox delivery (see users/outbox.py and `manage.py send_outbox`)
+EMAIL_OUTBOX_BATCH_SIZE = env.int("EMAIL_OUTBOX_BATCH_SIZE", default=50)
+EMAIL_OUTBOX_MAX_ATTEMPTS = env.int("EMAIL_OUTBOX_MAX_ATTEMPTS", default=8)
+EMAIL_OUTBOX_RETRY_DELAY = env.int("EMAIL_OUTBOX_RETRY_DELAY", default=60)
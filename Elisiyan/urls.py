@@ -2,11 +2,13 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from .metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('product/', include('products.urls')),
     path('users/', include('users.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ] + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)  
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
@@ -0,0 +1,129 @@
+import json
+import math
+import platform
+import subprocess
+import threading
+import time
+from datetime import datetime, timezone
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+# Password given to every user created by seed_catalog, so login can be benchmarked.
+SEED_PASSWORD = "bench-Passw0rd!"
+SEED_USER_PREFIX = "bench_user_"
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, query_counts, query_times, elapsed, errors=0):
+    latencies = sorted(latencies)
+    count = len(latencies)
+    return {
+        "requests": count,
+        "errors": errors,
+        "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "min": round(latencies[0] * 1000, 3) if latencies else 0.0,
+            "mean": round(sum(latencies) / count * 1000, 3) if count else 0.0,
+            "p50": round(percentile(latencies, 0.50) * 1000, 3),
+            "p95": round(percentile(latencies, 0.95) * 1000, 3),
+            "p99": round(percentile(latencies, 0.99) * 1000, 3),
+            "max": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        },
+        "sql_queries": {
+            "mean": round(sum(query_counts) / count, 2) if count else 0.0,
+            "max": max(query_counts, default=0),
+        },
+        "sql_time_ms_mean": round(sum(query_times) / count * 1000, 3) if count else 0.0,
+    }
+
+
+def timed_call(func):
+    """Run ``func()`` and return (result, seconds, query count, seconds spent in SQL)."""
+    with CaptureQueriesContext(connection) as captured:
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+    sql_time = sum(float(query.get("time") or 0) for query in captured.captured_queries)
+    return result, elapsed, len(captured), sql_time
+
+
+def run_concurrently(make_call, iterations, concurrency=1, warmup=0):
+    """
+    Call ``make_call(worker_index)()`` ``iterations`` times spread over
+    ``concurrency`` threads and summarize the timings. ``make_call`` gives
+    each thread its own callable so per-thread clients can be used.
+    """
+    latencies, query_counts, query_times = [], [], []
+    errors = 0
+    lock = threading.Lock()
+
+    def worker(index, count):
+        nonlocal errors
+        call = make_call(index)
+        for _ in range(warmup):
+            call()
+        for _ in range(count):
+            result, elapsed, queries, sql_time = timed_call(call)
+            with lock:
+                latencies.append(elapsed)
+                query_counts.append(queries)
+                query_times.append(sql_time)
+                if getattr(result, "status_code", 200) >= 400:
+                    errors += 1
+        connection.close()
+
+    share, extra = divmod(iterations, concurrency)
+    threads = [
+        threading.Thread(target=worker, args=(index, share + (1 if index < extra else 0)))
+        for index in range(concurrency)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, query_counts, query_times, time.perf_counter() - start, errors)
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, timeout=5, check=False
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "database": connection.vendor,
+    }
+
+
+def write_results(path, results, **metadata):
+    payload = {"environment": environment(), **metadata, "results": results}
+    with open(path, "w", encoding="utf-8") as output:
+        json.dump(payload, output, indent=2, sort_keys=True)
+    return payload
+
+
+def compare_results(previous_path, results):
+    """Yield (name, metric, before, after, change %) against a previous results file."""
+    with open(previous_path, encoding="utf-8") as previous_file:
+        previous = json.load(previous_file)["results"]
+    for name, current in results.items():
+        before = previous.get(name)
+        if not before:
+            continue
+        for metric in ("p50", "p95", "p99"):
+            old, new = before["latency_ms"][metric], current["latency_ms"][metric]
+            change = (new - old) / old * 100 if old else 0.0
+            yield name, metric, old, new, change
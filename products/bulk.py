@@ -0,0 +1,246 @@
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from .cache import bump_catalog_version
+from .images import schedule_variants
+from .similarity import bump_index_version
+from .suggest import bump_suggest_version
+from .models import Category, ClothingItem
+from .search import get_backend
+
+FIELDS = ["id", "name", "description", "price", "image", "category", "size", "color", "popularity"]
+UPDATE_FIELDS = ["name", "description", "price", "image", "category", "size", "color", "popularity"]
+FORMATS = ("csv", "jsonl")
+
+SIZES = {value for value, _ in ClothingItem.SIZE_CHOICES}
+COLORS = {value for value, _ in ClothingItem.COLOR_CHOICES}
+NAME_MAX_LENGTH = ClothingItem._meta.get_field("name").max_length
+PRICE_MAX = Decimal("1e8")
+# Largest values every supported database stores: a BigAutoField id, and a
+# PositiveIntegerField, which is a 32-bit integer on PostgreSQL.
+ID_MAX = 2 ** 63 - 1
+POPULARITY_MAX = 2 ** 31 - 1
+
+
+def guess_format(filename, default="csv"):
+    for file_format in FORMATS:
+        if filename and filename.lower().endswith(f".{file_format}"):
+            return file_format
+    return default
+
+
+def read_rows(stream, file_format):
+    """Yield one dict per record from a binary or text CSV/JSONL stream."""
+    if isinstance(stream, (io.RawIOBase, io.BufferedIOBase)) or hasattr(stream, "chunks"):
+        stream = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if file_format == "csv":
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield row if isinstance(row, dict) else {"__invalid__": line[:200]}
+
+
+class RowValidator:
+    """
+    Validates one import row at a time against in-memory lookup tables, so
+    a whole file is checked in a single pass without per-row queries.
+    """
+
+    def __init__(self, create_categories=False):
+        self.create_categories = create_categories
+        self.categories = {name.lower(): pk for pk, name in Category.objects.values_list("pk", "name")}
+        # Categories created by the chunk being written, forgotten if it rolls back.
+        self.new_categories = set()
+
+    def clean(self, row):
+        errors = {}
+        if "__invalid__" in row:
+            return None, {"row": "Not a JSON object."}
+
+        data = {}
+        raw_id = str(row.get("id") or "").strip()
+        if raw_id:
+            try:
+                data["id"] = int(raw_id)
+                if not 0 < data["id"] <= ID_MAX:
+                    raise ValueError
+            except ValueError:
+                errors["id"] = f"Must be an integer from 1 to {ID_MAX}."
+
+        for field in ("name", "description", "image"):
+            value = str(row.get(field) or "").strip()
+            if not value:
+                errors[field] = "This field is required."
+            data[field] = value
+        if len(data["name"]) > NAME_MAX_LENGTH:
+            errors["name"] = f"Ensure this field has no more than {NAME_MAX_LENGTH} characters."
+
+        try:
+            price = Decimal(str(row.get("price", "")).strip())
+            if not price.is_finite() or price < 0 or price >= PRICE_MAX:
+                raise InvalidOperation
+            data["price"] = price.quantize(Decimal("0.01"))
+        except InvalidOperation:
+            errors["price"] = "A valid non-negative number is required."
+
+        try:
+            data["popularity"] = int(row.get("popularity") or 0)
+            if not 0 <= data["popularity"] <= POPULARITY_MAX:
+                raise ValueError
+        except (TypeError, ValueError):
+            errors["popularity"] = f"Must be an integer from 0 to {POPULARITY_MAX}."
+
+        data["size"] = str(row.get("size") or "M").strip()
+        if data["size"] not in SIZES:
+            errors["size"] = f"'{data['size']}' is not a valid size."
+        data["color"] = str(row.get("color") or "Black").strip()
+        if data["color"] not in COLORS:
+            errors["color"] = f"'{data['color']}' is not a valid color."
+
+        category = str(row.get("category") or "").strip()
+        if not category:
+            errors["category"] = "This field is required."
+        elif category.lower() not in self.categories and not self.create_categories:
+            errors["category"] = f"Unknown category '{category}'."
+        data["category"] = category
+
+        return (None, errors) if errors else (data, None)
+
+    def category_id(self, name):
+        key = name.lower()
+        if key not in self.categories:
+            # create_categories: make it once, the first time a chunk needs it.
+            self.categories[key] = Category.objects.create(name=name).pk
+            self.new_categories.add(key)
+        return self.categories[key]
+
+    def commit_chunk(self):
+        self.new_categories.clear()
+
+    def rollback_chunk(self):
+        for key in self.new_categories:
+            del self.categories[key]
+        self.new_categories.clear()
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def import_rows(rows, batch_size=1000, create_categories=False, max_errors=1000):
+    """
+    Validate and write clothing items in chunks of ``batch_size``.
+
+    Rows with an ``id`` update that item; rows without one are created.
+    Each chunk is one transaction with one bulk_create and one bulk_update;
+    invalid rows are skipped and reported by their 1-based row number. A
+    chunk the database refuses is rolled back and all its rows reported,
+    and the import goes on with the next one. Items whose image has no
+    variants yet are queued for them, as a single save would.
+    """
+    validator = RowValidator(create_categories=create_categories)
+    report = {"created": 0, "updated": 0, "failed": 0, "errors": []}
+    backend = get_backend()
+
+    def reject(number, errors):
+        report["failed"] += 1
+        if len(report["errors"]) < max_errors:
+            report["errors"].append({"row": number, "errors": errors})
+
+    for chunk in _chunks(enumerate(rows, start=1), batch_size):
+        cleaned = []
+        for number, row in chunk:
+            data, errors = validator.clean(row)
+            if errors:
+                reject(number, errors)
+            else:
+                cleaned.append((number, data))
+
+        missing = []
+        try:
+            with transaction.atomic():
+                existing = ClothingItem.objects.in_bulk([data["id"] for _, data in cleaned if "id" in data])
+                to_create, to_update = [], []
+                # bulk_update skips auto_now; the suggest index syncs on updated_at.
+                now = timezone.now()
+                for number, data in cleaned:
+                    data["category_id"] = validator.category_id(data.pop("category"))
+                    item_id = data.pop("id", None)
+                    if item_id is None:
+                        to_create.append(ClothingItem(**data))
+                    elif item_id in existing:
+                        item = existing[item_id]
+                        for field, value in data.items():
+                            setattr(item, field, value)
+                        item.updated_at = now
+                        to_update.append(item)
+                    else:
+                        missing.append((number, item_id))
+
+                created = ClothingItem.objects.bulk_create(to_create, batch_size=batch_size)
+                ClothingItem.objects.bulk_update(to_update, UPDATE_FIELDS + ["updated_at"], batch_size=batch_size)
+                # bulk writes skip post_save, so index the chunk and queue its image variants here.
+                written = [item for item in created + to_update if item.pk is not None]
+                backend.index_items([item.pk for item in written])
+                for item in written:
+                    if item.image and item.image_variants.get("source") != item.image.name:
+                        schedule_variants(item.pk)
+        except DatabaseError as exc:
+            validator.rollback_chunk()
+            for number, _ in cleaned:
+                reject(number, {"row": f"Could not be saved: {exc}"})
+            continue
+        validator.commit_chunk()
+
+        for number, item_id in missing:
+            reject(number, {"id": f"Clothing item {item_id} does not exist."})
+        report["created"] += len(created)
+        report["updated"] += len(to_update)
+
+    report["errors"].sort(key=lambda error: error["row"])
+    if report["created"] or report["updated"]:
+        transaction.on_commit(bump_catalog_version)
+        transaction.on_commit(bump_index_version)
+        transaction.on_commit(bump_suggest_version)
+    return report
+
+
+def export_rows(queryset, file_format="csv", chunk_size=2000):
+    """
+    Yield the queryset as CSV or JSONL text, one record at a time. Rows are
+    read with ``iterator()`` so memory does not grow with the table.
+    """
+    columns = ["id", "name", "description", "price", "image", "category__name", "size", "color", "popularity"]
+    rows = queryset.order_by("pk").values_list(*columns).iterator(chunk_size=chunk_size)
+
+    if file_format == "jsonl":
+        for row in rows:
+            record = dict(zip(FIELDS, row))
+            record["price"] = str(record["price"])
+            yield json.dumps(record, ensure_ascii=False) + "\n"
+        return
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(FIELDS)
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
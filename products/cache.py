@@ -0,0 +1,134 @@
+import hashlib
+from collections import namedtuple
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import CatalogVersion
+
+PROCESS_LOCAL_BACKENDS = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+StoredVersion = namedtuple("StoredVersion", ["identity", "version"])
+
+
+def cache_is_shared(alias="default"):
+    """Whether every worker sees the same cache, i.e. it is not a per-process locmem (or dummy) cache."""
+    return settings.CACHES[alias]["BACKEND"] not in PROCESS_LOCAL_BACKENDS
+
+
+def get_catalog_version():
+    """
+    Current catalog version. Cached catalog data is keyed on it, so bumping
+    the counter invalidates every entry at once without deleting anything.
+    """
+    return get_stored_catalog_version()
+
+
+def bump_catalog_version():
+    bump_stored_catalog_version()
+
+
+def get_stored_catalog_version():
+    """
+    The catalog version as counted in the database, as a StoredVersion of
+    the database's random identity and the counter. It is one primary-key
+    lookup, the same in every process (the default cache is per process)
+    and survives restarts; with the identity it can label data kept
+    outside the cache (products/snapshot.py) without matching another
+    database's.
+    """
+    return StoredVersion(*get_stored_counters("identity", "version"))
+
+
+def bump_stored_catalog_version():
+    bump_stored_counters("version")
+
+
+def get_stored_counters(*fields):
+    """The named columns of the CatalogVersion row, as a tuple."""
+    row = CatalogVersion.objects.filter(pk=1).values_list(*fields).first()
+    if row is None:
+        stored, _ = CatalogVersion.objects.get_or_create(pk=1)
+        row = tuple(getattr(stored, field) for field in fields)
+    return row
+
+
+def bump_stored_counters(*fields):
+    if not CatalogVersion.objects.filter(pk=1).update(**{field: F(field) + 1 for field in fields}):
+        # The row is created by the migration; recreate it if it went missing.
+        CatalogVersion.objects.get_or_create(pk=1, defaults={field: 2 for field in fields})
+
+
+def catalog_cache_key(prefix, params):
+    """Build a bounded-length key from a prefix, the catalog version and normalized params."""
+    normalized = "&".join(f"{key}={value}" for key, value in sorted(params.items()) if value not in ("", None))
+    digest = hashlib.sha1(normalized.encode()).hexdigest()
+    identity, version = get_catalog_version()
+    return f"catalog:{prefix}:{identity}:v{version}:{digest}"
+
+
+def catalog_cache_timeout():
+    return getattr(settings, "CATALOG_CACHE_TIMEOUT", 3600)
+
+
+def response_cache_key(request, view, kwargs):
+    params = {
+        "view": f"{view.basename}.{view.action}",
+        "host": request.get_host(),
+        "media_type": request.accepted_media_type,
+        "kwargs": ",".join(f"{key}={value}" for key, value in sorted(kwargs.items())),
+    }
+    for key in request.query_params:
+        params[f"qp.{key}"] = ",".join(sorted(request.query_params.getlist(key)))
+    return catalog_cache_key("response", params)
+
+
+def etag_matches(request, etag):
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def cached_catalog_response(view_method):
+    """
+    Cache a read-only catalog action under the catalog version. The
+    version is read from the database on every request, so a write in any
+    worker invalidates the entries and ETags of all of them.
+
+    The key covers the action, its URL kwargs, every query parameter and the
+    negotiated media type. The strong ETag is derived from the key, so it
+    changes exactly when the catalog version does and a matching
+    If-None-Match is answered with 304 before any query or serialization.
+    A view can set ``response.cacheable = False`` to send a response
+    without caching it or giving it the ETag.
+    """
+    @wraps(view_method)
+    def wrapper(view, request, *args, **kwargs):
+        key = response_cache_key(request, view, kwargs)
+        etag = '"%s"' % hashlib.sha1(key.encode()).hexdigest()
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+        if etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        cached = cache.get(key)
+        if cached is not None:
+            return Response(cached, headers=headers)
+
+        response = view_method(view, request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK and getattr(response, "cacheable", True):
+            cache.set(key, response.data, catalog_cache_timeout())
+            for header, value in headers.items():
+                response[header] = value
+        return response
+
+    return wrapper
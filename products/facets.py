@@ -0,0 +1,86 @@
+from collections import Counter
+
+from django.db.models import BooleanField, Case, Count, IntegerField, Value, When
+
+from .models import ClothingItem
+
+# Price ranges shown next to the price filter; ``None`` leaves the upper end open.
+PRICE_BUCKETS = (
+    (0, 1000),
+    (1000, 2000),
+    (2000, 5000),
+    (5000, 10000),
+    (10000, None),
+)
+
+FACETS = ("size", "color", "category", "price")
+
+
+def price_bucket_expression():
+    whens = [
+        When(price__lt=upper, then=Value(index))
+        for index, (lower, upper) in enumerate(PRICE_BUCKETS)
+        if upper is not None
+    ]
+    return Case(*whens, default=Value(len(PRICE_BUCKETS) - 1), output_field=IntegerField())
+
+
+def compute_facets(queryset, conditions):
+    """
+    Count matching items per size, color, category and price bucket.
+
+    ``queryset`` carries the filters shared by every facet (the search query);
+    ``conditions`` maps a facet name to the Q of its own filter. Each facet's
+    counts ignore its own condition but honour all the others, so choosing a
+    color still shows how many items every other color has.
+
+    Every condition becomes a boolean column and the rows are grouped once by
+    (size, color, category, bucket, flags); the per-facet totals are summed
+    from that single result set.
+    """
+    flags = {
+        f"match_{facet}": Case(When(condition, then=Value(True)), default=Value(False), output_field=BooleanField())
+        for facet, condition in conditions.items()
+    }
+    rows = (
+        queryset.order_by()
+        .annotate(price_bucket=price_bucket_expression(), **flags)
+        .values("size", "color", "category__name", "price_bucket", *flags)
+        .annotate(count=Count("id"))
+    )
+
+    counts = {facet: Counter() for facet in FACETS}
+    total = 0
+    for row in rows:
+        values = {
+            "size": row["size"],
+            "color": row["color"],
+            "category": row["category__name"],
+            "price": row["price_bucket"],
+        }
+        matched = {facet: row.get(f"match_{facet}", True) for facet in FACETS}
+        if all(matched.values()):
+            total += row["count"]
+        for facet in FACETS:
+            if all(ok for other, ok in matched.items() if other != facet):
+                counts[facet][values[facet]] += row["count"]
+
+    return {
+        "total": total,
+        "size": [
+            {"value": value, "label": label, "count": counts["size"][value]}
+            for value, label in ClothingItem.SIZE_CHOICES
+        ],
+        "color": [
+            {"value": value, "label": label, "count": counts["color"][value]}
+            for value, label in ClothingItem.COLOR_CHOICES
+        ],
+        "category": [
+            {"value": name, "count": count}
+            for name, count in sorted(counts["category"].items(), key=lambda item: (-item[1], item[0] or ""))
+        ],
+        "price": [
+            {"min": lower, "max": upper, "count": counts["price"][index]}
+            for index, (lower, upper) in enumerate(PRICE_BUCKETS)
+        ],
+    }
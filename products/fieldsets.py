@@ -0,0 +1,141 @@
+"""
+Sparse fieldsets: ``?fields=`` and ``?exclude=`` on read endpoints.
+
+``?fields=id,name,price,image`` keeps only the listed fields, and
+``?exclude=description`` drops fields. A dotted name reaches into a nested
+serializer: ``?fields=id,clothing_item.name`` on the wishlist, or
+``?exclude=category.name``. A nested field named without a dot is kept
+whole. An unknown name is a 400.
+
+The selection also shrinks the query. ``deferred_columns()`` maps each
+dropped serializer field to the model columns it reads and ``.defer()``s
+those that no kept field needs, nested relations included. For the
+common list selection this leaves out ``description``, the only large
+column. Views name the columns they read themselves (keyset ordering
+values, the fragment version) so those are never deferred.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+FIELDS_PARAM = "fields"
+EXCLUDE_PARAM = "exclude"
+
+
+def parse_names(value):
+    return frozenset(name.strip() for name in value.split(",") if name.strip()) if value else frozenset()
+
+
+def nested_names(names, prefix):
+    return frozenset(name[len(prefix) + 1:] for name in names if name.startswith(prefix + "."))
+
+
+class SparseFieldsSerializerMixin:
+    """
+    Serializer mixin taking ``fields`` (names to keep, or None for all) and
+    ``exclude`` (names to drop), both sets of possibly dotted names.
+    """
+
+    # Serializer fields that read model columns other than their source, e.g. method fields.
+    column_sources = {}
+
+    def __init__(self, *args, fields=None, exclude=frozenset(), **kwargs):
+        self.sparse_fields = fields
+        self.sparse_exclude = exclude
+        super().__init__(*args, **kwargs)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        wanted, unwanted = self.sparse_fields, self.sparse_exclude
+        if wanted is None and not unwanted:
+            return fields
+
+        unknown = {name.split(".", 1)[0] for name in (wanted or frozenset()) | unwanted} - set(fields)
+        if unknown:
+            raise serializers.ValidationError({FIELDS_PARAM: f"Unknown field(s): {', '.join(sorted(unknown))}."})
+        for name in list(fields):
+            nested_wanted = nested_names(wanted, name) if wanted is not None else None
+            if name in unwanted or (wanted is not None and name not in wanted and not nested_wanted):
+                del fields[name]
+                continue
+            if isinstance(fields[name], SparseFieldsSerializerMixin):
+                fields[name].sparse_fields = nested_wanted if wanted is not None and name not in wanted else None
+                fields[name].sparse_exclude = nested_names(unwanted, name)
+        return fields
+
+
+def field_columns(serializer, field):
+    """Model columns a non-nested serializer field reads."""
+    if field.field_name in serializer.column_sources:
+        return set(serializer.column_sources[field.field_name])
+    try:
+        model_field = serializer.Meta.model._meta.get_field(field.source)
+    except (FieldDoesNotExist, AttributeError):
+        return set()
+    if model_field.concrete and not model_field.is_relation and not model_field.primary_key:
+        return {model_field.name}
+    return set()
+
+
+def deferred_columns(serializer_class, fields=None, exclude=frozenset(), prefix=""):
+    """Columns, as ``.defer()`` paths, that only the fields dropped by the selection read."""
+    full, sparse = serializer_class(), serializer_class(fields=fields, exclude=exclude)
+    return _deferred(full, sparse, prefix)
+
+
+def _deferred(full, sparse, prefix):
+    dropped, needed, nested = set(), set(), set()
+    for name, field in full.fields.items():
+        if isinstance(field, SparseFieldsSerializerMixin):
+            # A nested object is read through select_related; defer inside it, never the relation.
+            if name in sparse.fields:
+                nested |= _deferred(field, sparse.fields[name], f"{prefix}{field.source}__")
+            continue
+        columns = field_columns(full, field)
+        if name in sparse.fields:
+            needed |= columns
+        else:
+            dropped |= columns
+    return {prefix + column for column in dropped - needed} | nested
+
+
+class SparseFieldsMixin:
+    """
+    View mixin: hands ``?fields=``/``?exclude=`` to the serializer on GET,
+    HEAD and read-only POST actions, and ``sparse_queryset()`` defers the
+    columns they leave out.
+    The serializer must use SparseFieldsSerializerMixin.
+    """
+
+    # Columns the view itself reads from the rows, on top of the keyset ordering.
+    sparse_required_columns = ()
+
+    def get_fieldset(self):
+        read_only_post = self.request.method == "POST" and self.action in getattr(self, "read_only_post_actions", ())
+        if self.request.method not in ("GET", "HEAD") and not read_only_post:
+            return None, frozenset()
+        params = self.request.query_params
+        return parse_names(params.get(FIELDS_PARAM)) or None, parse_names(params.get(EXCLUDE_PARAM))
+
+    def get_serializer(self, *args, **kwargs):
+        fields, exclude = self.get_fieldset()
+        kwargs.setdefault("fields", fields)
+        kwargs.setdefault("exclude", exclude)
+        return super().get_serializer(*args, **kwargs)
+
+    def get_sparse_required_columns(self):
+        required = set(self.sparse_required_columns)
+        if hasattr(self, "get_keyset_ordering"):
+            required.update(field.lstrip("-") for field in self.get_keyset_ordering())
+        return required
+
+    def sparse_queryset(self, queryset, serializer_class=None):
+        fields, exclude = self.get_fieldset()
+        if fields is None and not exclude:
+            return queryset
+        try:
+            columns = deferred_columns(serializer_class or self.get_serializer_class(), fields, exclude)
+        except serializers.ValidationError:
+            # Reported when the serializer renders; query everything meanwhile.
+            return queryset
+        columns -= self.get_sparse_required_columns()
+        return queryset.defer(*sorted(columns)) if columns else queryset
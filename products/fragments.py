@@ -0,0 +1,165 @@
+"""
+Pre-serialized JSON fragments of catalog items.
+
+Most of the CPU time of a large listing page goes into
+ClothingItemSerializer: field by field, the nested category and the image
+srcset, for every row, on every cache miss. This module keeps each item's
+JSON as ready-encoded bytes, and a list response is assembled by joining
+them. Only items whose row changed since they were last encoded go
+through the serializer.
+
+A fragment is keyed on the item id and its version. The version is the
+row's ``updated_at``, and every write that changes what the serializer
+outputs moves it:
+
+- saves and bulk imports (auto_now, or set explicitly)
+- review ratings (products/ratings.py)
+- buffered popularity (products/popularity.py)
+- image variants (products/images.py)
+- category renames, which touch every item in the category (products/signals.py)
+
+The name of the item's category, loaded by the same select_related query,
+is part of the version too, so a fragment never shows an old category
+name even after a rename that skipped the signal (a queryset update).
+
+A lookup therefore never needs a shared-cache round trip. The version is
+already on the row the page loads, and each worker's cache stays correct
+on its own. The cache is an in-process LRU bounded by FRAGMENT_CACHE_BYTES
+of encoded JSON. Fragments of deleted items are never asked for again, so
+they simply age out.
+
+Image URLs are absolute, so the key also includes the scheme and host of
+the request.
+"""
+import json
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from Elisiyan.metrics import inc
+from Elisiyan.renderers import NDJSONRenderer, ORJSONRenderer
+from Elisiyan.renderers import dumps as encode
+
+from .models import ClothingItem
+
+
+class Fragments(list):
+    """Encoded JSON values (bytes); rendered as a JSON array without decoding them."""
+
+    def render(self):
+        return b"[" + b",".join(self) + b"]"
+
+
+class FragmentCache:
+    """Thread-safe LRU of key -> (version, bytes), bounded by the total size of the bytes."""
+
+    def __init__(self, max_bytes):
+        self.lock = threading.Lock()
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+
+    def get(self, key, version):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, version, fragment):
+        if len(fragment) > self.max_bytes:
+            return
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous[1])
+            self.entries[key] = (version, fragment)
+            self.size += len(fragment)
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+fragment_cache = FragmentCache(getattr(settings, "FRAGMENT_CACHE_BYTES", 32 * 1024 * 1024))
+
+
+def fragment_version(item):
+    """The row's ``updated_at`` and, if it was loaded with the item, the category's name."""
+    category = item.category.name if ClothingItem.category.is_cached(item) else None
+    return item.updated_at, category
+
+
+def serialize_items(items, serializer_class, context=None, **kwargs):
+    """
+    The serialized ``items`` as Fragments, encoding only those whose
+    fragment is missing or was built from an older version of the row.
+    ``kwargs`` go to the serializer and are part of the key (e.g. a sparse
+    fieldset), so they must be hashable.
+    """
+    context = context or {}
+    request = context.get("request")
+    base = request.build_absolute_uri("/") if request is not None else ""
+    variant = (serializer_class.__name__, base, *sorted(kwargs.items()))
+    fragments = Fragments()
+    missing = []
+    for position, item in enumerate(items):
+        fragment = fragment_cache.get((*variant, item.pk), fragment_version(item))
+        if fragment is None:
+            missing.append(position)
+        fragments.append(fragment)
+
+    if missing:
+        data = serializer_class([items[position] for position in missing], many=True, context=context, **kwargs).data
+        for position, row in zip(missing, data):
+            item = items[position]
+            fragments[position] = encode(row)
+            fragment_cache.set((*variant, item.pk), fragment_version(item), fragments[position])
+    inc("fragment_cache_total", len(fragments) - len(missing), result="hit")
+    inc("fragment_cache_total", len(missing), result="miss")
+    return fragments
+
+
+class FragmentJSONRenderer(ORJSONRenderer):
+    """
+    The API's JSON renderer, except that Fragments, at the top level or as
+    a value of a top-level dict (a paginated page), are written by joining
+    their bytes. Indented output (the browsable API) decodes them and
+    renders normally.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            return super().render(self.decoded(data), accepted_media_type, renderer_context)
+        if isinstance(data, Fragments):
+            return data.render()
+        if isinstance(data, dict) and any(isinstance(value, Fragments) for value in data.values()):
+            members = [
+                encode(key) + b":" + (value.render() if isinstance(value, Fragments) else encode(value))
+                for key, value in data.items()
+            ]
+            return b"{" + b",".join(members) + b"}"
+        return super().render(data, accepted_media_type, renderer_context)
+
+    @staticmethod
+    def decoded(data):
+        if isinstance(data, Fragments):
+            return [json.loads(fragment) for fragment in data]
+        if isinstance(data, dict):
+            return {key: FragmentJSONRenderer.decoded(value) if isinstance(value, Fragments) else value
+                    for key, value in data.items()}
+        return data
+
+
+class FragmentNDJSONRenderer(NDJSONRenderer):
+    def encode_rows(self, rows):
+        if isinstance(rows, Fragments):
+            return b"".join(fragment + b"\n" for fragment in rows)
+        return super().encode_rows(rows)
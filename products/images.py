@@ -0,0 +1,139 @@
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+from .cache import bump_catalog_version
+from .models import ClothingItem
+
+logger = logging.getLogger(__name__)
+
+# format name -> (Pillow format, file extension, save options)
+VARIANT_FORMATS = {
+    "avif": ("AVIF", "avif", {"quality": 60}),
+    "webp": ("WEBP", "webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "jpg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def variant_widths():
+    return tuple(sorted(getattr(settings, "IMAGE_VARIANT_WIDTHS", (200, 400, 800))))
+
+
+def variant_formats():
+    formats = getattr(settings, "IMAGE_VARIANT_FORMATS", ("webp", "jpeg"))
+    # AVIF needs a Pillow build with libavif; skip it rather than fail uploads.
+    return [name for name in formats if name != "avif" or features.check("avif")]
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "IMAGE_VARIANT_WORKERS", 2),
+                thread_name_prefix="image-variants",
+            )
+        return _executor
+
+
+def variant_name(source_name, width, extension):
+    """
+    Path of one variant of ``source_name``. A hash of the whole source name
+    keeps ``foo.jpg`` and ``foo.png`` from writing (and deleting) each
+    other's variants.
+    """
+    directory, filename = os.path.split(source_name)
+    stem = os.path.splitext(filename)[0]
+    digest = hashlib.sha1(source_name.encode()).hexdigest()[:10]
+    return os.path.join(directory, "variants", f"{stem}-{digest}-{width}w.{extension}")
+
+
+def render_variant(image, width, format_name):
+    pil_format, _, options = VARIANT_FORMATS[format_name]
+    height = max(1, round(image.height * width / image.width))
+    resized = image.resize((width, height), Image.LANCZOS) if width != image.width else image.copy()
+    if pil_format == "JPEG" and resized.mode != "RGB":
+        background = Image.new("RGB", resized.size, (255, 255, 255))
+        background.paste(resized, mask=resized.getchannel("A") if "A" in resized.getbands() else None)
+        resized = background
+    buffer = BytesIO()
+    resized.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def generate_variants(source_name, storage=default_storage):
+    """
+    Write every configured width/format of one stored image and return
+    ``{"source": name, "<format>": {"<width>": path}}``. The original is
+    never upscaled; an image narrower than the smallest width gets a single
+    variant at its own width.
+    """
+    with storage.open(source_name, "rb") as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "PA") else "RGB")
+
+    widths = [width for width in variant_widths() if width <= image.width] or [image.width]
+    variants = {"source": source_name}
+    for format_name in variant_formats():
+        extension = VARIANT_FORMATS[format_name][1]
+        paths = {}
+        for width in widths:
+            path = variant_name(source_name, width, extension)
+            if storage.exists(path):
+                storage.delete(path)
+            paths[str(width)] = storage.save(path, ContentFile(render_variant(image, width, format_name)))
+        variants[format_name] = paths
+    return variants
+
+
+def process_item(item_id):
+    """Generate the variants of one item's current image and store the map on the row."""
+    try:
+        item = ClothingItem.objects.only("image", "image_variants").get(pk=item_id)
+        if not item.image:
+            return None
+        variants = generate_variants(item.image.name)
+        # update() rather than save(): the post_save handler would schedule this again.
+        if ClothingItem.objects.filter(pk=item_id, image=item.image.name).update(image_variants=variants, updated_at=timezone.now()):
+            bump_catalog_version()
+        return variants
+    finally:
+        close_old_connections()
+
+
+def _run_in_background(item_id):
+    try:
+        process_item(item_id)
+    except Exception:
+        logger.exception("Generating image variants failed for clothing item %s", item_id)
+
+
+def schedule_variants(item_id):
+    """Queue variant generation once the current transaction has committed."""
+    transaction.on_commit(lambda: get_executor().submit(_run_in_background, item_id))
+
+
+def srcset(variants, build_url):
+    """``{"webp": "url 200w, url 400w", ...}`` for a stored variant map."""
+    return {
+        format_name: ", ".join(
+            f"{build_url(path)} {width}w" for width, path in sorted(paths.items(), key=lambda item: int(item[0]))
+        )
+        for format_name, paths in variants.items()
+        if format_name != "source"
+    }
@@ -0,0 +1,98 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from rest_framework.authtoken.models import Token
+
+from products.benchmark import SEED_PASSWORD, SEED_USER_PREFIX, compare_results, run_concurrently, write_results
+from products.cache import bump_catalog_version
+from products.models import ClothingItem, Review, Wishlist
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the main API endpoints in-process and report p50/p95/p99 latency, throughput "
+        "and SQL query counts. Run seed_catalog first for production-sized data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=200, help="Requests per scenario.")
+        parser.add_argument("--concurrency", type=int, default=1, help="Client threads per scenario.")
+        parser.add_argument("--warmup", type=int, default=5, help="Untimed requests per thread before measuring.")
+        parser.add_argument("--only", action="append", help="Run only the named scenario(s).")
+        parser.add_argument("--cold", action="store_true", help="Invalidate the catalog response cache before every request.")
+        parser.add_argument("--output", default="benchmark-results.json", help="Where to write the JSON results.")
+        parser.add_argument("--compare", help="Previous results file to compare latencies against.")
+
+    def handle(self, *args, **options):
+        item = ClothingItem.objects.order_by("-review_count").first()
+        user = User.objects.filter(username__startswith=SEED_USER_PREFIX, is_active=True).first()
+        if item is None or user is None:
+            raise CommandError("No seeded data found; run `manage.py seed_catalog` first.")
+        if not Wishlist.objects.filter(user=user).exists():
+            Wishlist.objects.create(user=user, clothing_item=item)
+        token, _ = Token.objects.get_or_create(user=user)
+        category = item.category.name
+
+        reviewed_item = Review.objects.values_list("clothing_item", flat=True).first() or item.pk
+        scenarios = {
+            "clothing_list": ("get", "/product/clothing/", {}),
+            "clothing_list_popularity": ("get", "/product/clothing/", {"sort_by": "popularity"}),
+            "clothing_list_filtered": ("get", "/product/clothing/", {"color": item.color, "size": item.size, "sort_by": "price"}),
+            "clothing_list_category": ("get", "/product/clothing/", {"category": category, "price_max": "5000"}),
+            "clothing_search": ("get", "/product/clothing/", {"q": item.name.split()[-1]}),
+            "clothing_facets": ("get", "/product/clothing/facets/", {"color": item.color}),
+            "clothing_detail": ("get", f"/product/clothing/{item.pk}/", {}),
+            "item_reviews": ("get", f"/product/reviews/{reviewed_item}/reviews/", {}),
+            "wishlist": ("get", "/product/wishlist/view_wishlist/", {}),
+            "login": ("post", "/users/login/", {"username": user.username, "password": SEED_PASSWORD}),
+        }
+        if options["only"]:
+            unknown = set(options["only"]) - set(scenarios)
+            if unknown:
+                raise CommandError(f"Unknown scenario(s): {', '.join(sorted(unknown))}")
+            scenarios = {name: scenarios[name] for name in options["only"]}
+
+        def make_call(method, url, params):
+            def factory(index):
+                client = Client(HTTP_AUTHORIZATION=f"Token {token.key}")
+                if url.startswith("/product/wishlist/"):
+                    client.force_login(user)
+
+                def call():
+                    if options["cold"]:
+                        bump_catalog_version()
+                    return getattr(client, method)(url, params)
+                return call
+            return factory
+
+        results = {}
+        for name, (method, url, params) in scenarios.items():
+            results[name] = run_concurrently(
+                make_call(method, url, params),
+                options["iterations"],
+                concurrency=options["concurrency"],
+                warmup=options["warmup"],
+            )
+            latency = results[name]["latency_ms"]
+            self.stdout.write(
+                f"{name:<28} p50 {latency['p50']:>8.2f}ms  p95 {latency['p95']:>8.2f}ms  "
+                f"p99 {latency['p99']:>8.2f}ms  {results[name]['throughput_rps']:>8.1f} req/s  "
+                f"{results[name]['sql_queries']['mean']:>5.1f} queries  {results[name]['errors']} errors"
+            )
+
+        write_results(
+            options["output"],
+            results,
+            parameters={key: options[key] for key in ("iterations", "concurrency", "warmup", "cold")},
+            dataset={
+                "clothing_items": ClothingItem.objects.count(),
+                "reviews": Review.objects.count(),
+                "wishlists": Wishlist.objects.count(),
+                "users": User.objects.count(),
+            },
+        )
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+        if options["compare"]:
+            for name, metric, before, after, change in compare_results(options["compare"], results):
+                self.stdout.write(f"{name:<28} {metric}: {before:.2f}ms -> {after:.2f}ms ({change:+.1f}%)")
@@ -0,0 +1,72 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+
+from Elisiyan.renderers import ORJSONRenderer
+from products.benchmark import summarize, write_results
+from products.fragments import FragmentJSONRenderer, fragment_cache, serialize_items
+from products.models import ClothingItem
+from products.serializers import ClothingItemSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare rendering listing pages with ClothingItemSerializer (serializer) against "
+        "stitching pre-encoded item fragments, with an empty (fragments_cold) and a warm "
+        "(fragments_warm) fragment cache. Rows are loaded once, so only serialization and rendering are timed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=200, help="Pages rendered per mode.")
+        parser.add_argument("--page-size", type=int, default=100)
+        parser.add_argument("--pages", type=int, default=10, help="Distinct pages cycled through.")
+        parser.add_argument("--output", default="fragments-benchmark.json")
+
+    def handle(self, *args, **options):
+        size = options["page_size"]
+        items = list(ClothingItem.objects.select_related("category").order_by("price", "id")[:size * options["pages"]])
+        if not items:
+            raise CommandError("No clothing items found; run `manage.py seed_catalog` first.")
+        pages = [items[start:start + size] for start in range(0, len(items), size)]
+        context = {"request": RequestFactory().get("/product/clothing/")}
+
+        def plain(page):
+            data = ClothingItemSerializer(page, many=True, context=context).data
+            return ORJSONRenderer().render({"next": None, "previous": None, "results": data})
+
+        def fragments(page):
+            data = serialize_items(page, ClothingItemSerializer, context)
+            return FragmentJSONRenderer().render({"next": None, "previous": None, "results": data})
+
+        for page in pages:
+            if plain(page) != fragments(page):
+                raise CommandError("Fragment output differs from the serializer output.")
+
+        modes = {
+            "serializer": (plain, False),
+            "fragments_cold": (fragments, True),
+            "fragments_warm": (fragments, False),
+        }
+        results = {}
+        for mode, (render, cold) in modes.items():
+            latencies = []
+            start = time.perf_counter()
+            for iteration in range(options["iterations"]):
+                if cold:
+                    fragment_cache.clear()
+                page = pages[iteration % len(pages)]
+                began = time.perf_counter()
+                render(page)
+                latencies.append(time.perf_counter() - began)
+            results[mode] = summarize(latencies, [], [], time.perf_counter() - start)
+            self.stdout.write(
+                f"{mode:<15} p50 {results[mode]['latency_ms']['p50']:>8.3f}ms  "
+                f"p99 {results[mode]['latency_ms']['p99']:>8.3f}ms  "
+                f"{results[mode]['throughput_rps']:>9.1f} pages/s"
+            )
+
+        write_results(options["output"], results, parameters={
+            key: options[key] for key in ("iterations", "page_size", "pages")
+        })
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
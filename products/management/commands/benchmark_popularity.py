@@ -0,0 +1,90 @@
+import random
+import threading
+import time
+from itertools import accumulate
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+from django.db.models import F, Sum
+
+from products import popularity
+from products.benchmark import summarize, write_results
+from products.models import ClothingItem
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare popularity write throughput under concurrent load: one UPDATE per event "
+        "(direct) against the write buffer flushed in batches (buffered)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--events", type=int, default=5000, help="Events per mode.")
+        parser.add_argument("--concurrency", type=int, default=8, help="Writer threads.")
+        parser.add_argument("--items", type=int, default=200, help="Distinct items receiving events (most popular first).")
+        parser.add_argument("--mode", choices=["direct", "buffered"], action="append", help="Run only the given mode(s).")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--output", default="popularity-benchmark.json")
+
+    def handle(self, *args, **options):
+        item_ids = list(ClothingItem.objects.order_by("-popularity", "id").values_list("id", flat=True)[:options["items"]])
+        if not item_ids:
+            raise CommandError("No clothing items found; run `manage.py seed_catalog` first.")
+        # Events are skewed towards a few hot items, as storefront traffic is.
+        rng = random.Random(options["seed"])
+        events = rng.choices(item_ids, cum_weights=list(accumulate(1 / (rank + 1) for rank in range(len(item_ids)))), k=options["events"])
+
+        writers = {
+            "direct": lambda item_id: ClothingItem.objects.filter(pk=item_id).update(popularity=F("popularity") + 1),
+            "buffered": lambda item_id: popularity.record(item_id, "view"),
+        }
+        results = {}
+        for mode in options["mode"] or list(writers):
+            before = self.total_popularity(item_ids)
+            results[mode] = self.run(writers[mode], events, options["concurrency"])
+            lost = len(events) - results[mode]["errors"] - (self.total_popularity(item_ids) - before)
+            results[mode]["lost_increments"] = lost
+            self.stdout.write(
+                f"{mode:<9} {results[mode]['throughput_rps']:>10.1f} events/s  "
+                f"p99 {results[mode]['latency_ms']['p99']:>8.3f}ms  "
+                f"{results[mode]['errors']} errors  {lost} lost"
+            )
+
+        write_results(options["output"], results, parameters={
+            key: options[key] for key in ("events", "concurrency", "items", "seed")
+        })
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    @staticmethod
+    def total_popularity(item_ids):
+        return ClothingItem.objects.filter(pk__in=item_ids).aggregate(total=Sum("popularity"))["total"] or 0
+
+    @staticmethod
+    def run(write, events, concurrency):
+        latencies, errors = [], 0
+        lock = threading.Lock()
+
+        def worker(share):
+            nonlocal errors
+            for item_id in share:
+                start = time.perf_counter()
+                try:
+                    write(item_id)
+                except DatabaseError:
+                    with lock:
+                        errors += 1
+                    continue
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+            connection.close()
+
+        threads = [threading.Thread(target=worker, args=(events[index::concurrency],)) for index in range(concurrency)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Buffered events only count once they are in the database.
+        popularity.flush()
+        elapsed = time.perf_counter() - start
+        return summarize(latencies, [], [], elapsed, errors)
@@ -0,0 +1,72 @@
+import io
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from Elisiyan.renderers import ORJSONParser, ORJSONRenderer
+from products.benchmark import summarize, write_results
+from products.models import ClothingItem, Wishlist
+from products.serializers import ClothingItemSerializer, WishlistSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare DRF's stdlib JSONRenderer/JSONParser with the orjson renderer and parser on "
+        "/product/clothing/ and wishlist payloads. Payloads are serialized once; only encoding "
+        "and decoding are timed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=300)
+        parser.add_argument("--page-size", type=int, default=100, help="Items (or wishlist entries) per payload.")
+        parser.add_argument("--output", default="renderers-benchmark.json")
+
+    def handle(self, *args, **options):
+        size = options["page_size"]
+        context = {"request": RequestFactory().get("/product/clothing/")}
+        items = ClothingItem.objects.select_related("category").order_by("price", "id")[:size]
+        entries = Wishlist.objects.select_related("user", "clothing_item__category").order_by("-id")[:size]
+        payloads = {
+            "clothing": {"next": None, "previous": None,
+                         "results": ClothingItemSerializer(items, many=True, context=context).data},
+            "wishlist": WishlistSerializer(entries, many=True, context=context).data,
+        }
+        if not payloads["clothing"]["results"]:
+            raise CommandError("No clothing items found; run `manage.py seed_catalog` first.")
+
+        results = {}
+        for name, payload in payloads.items():
+            stdlib, fast = JSONRenderer().render(payload), ORJSONRenderer().render(payload)
+            if json.loads(stdlib) != json.loads(fast):
+                raise CommandError(f"orjson output for the {name} payload differs from JSONRenderer.")
+            cases = {
+                "render_stdlib": lambda: JSONRenderer().render(payload),
+                "render_orjson": lambda: ORJSONRenderer().render(payload),
+                "parse_stdlib": lambda: JSONParser().parse(io.BytesIO(stdlib)),
+                "parse_orjson": lambda: ORJSONParser().parse(io.BytesIO(stdlib)),
+            }
+            for case, call in cases.items():
+                results[f"{name}.{case}"] = self.run(call, options["iterations"])
+                self.stdout.write(
+                    f"{name + '.' + case:<24} p50 {results[f'{name}.{case}']['latency_ms']['p50']:>8.3f}ms  "
+                    f"p99 {results[f'{name}.{case}']['latency_ms']['p99']:>8.3f}ms  ({len(stdlib)} bytes)"
+                )
+
+        write_results(options["output"], results, parameters={
+            key: options[key] for key in ("iterations", "page_size")
+        })
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    @staticmethod
+    def run(call, iterations):
+        latencies = []
+        start = time.perf_counter()
+        for _ in range(iterations):
+            began = time.perf_counter()
+            call()
+            latencies.append(time.perf_counter() - began)
+        return summarize(latencies, [], [], time.perf_counter() - start)
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from products.cache import get_stored_catalog_version
+from products.snapshot import build_snapshot, snapshot_dir
+
+
+class Command(BaseCommand):
+    help = (
+        "Build and publish the memory-mapped catalog snapshot for the current catalog version, "
+        "so listings don't query the database until a worker has built it in the background."
+    )
+
+    def handle(self, *args, **options):
+        version = get_stored_catalog_version()
+        path = build_snapshot(version)
+        self.stdout.write(self.style.SUCCESS(
+            f"Catalog snapshot written to {path} (directory {snapshot_dir(version.identity)})."
+        ))
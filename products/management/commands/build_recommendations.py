@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from products.recommendations import build_recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the stored \"also saved\" neighbours from wishlists and purchases. Only items "
+        "whose wishlist or purchase history changed since the last run are recomputed unless --full is given. "
+        "Incremental runs leave some neighbour lists approximate; schedule a --full run periodically as well."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true", help="Recompute every item, not just stale ones.")
+        parser.add_argument("--top-k", type=int, help="Neighbours to keep per item (default: RECOMMENDATION_TOP_K).")
+        parser.add_argument("--min-support", type=int, default=1, help="Minimum users an item pair must share.")
+
+    def handle(self, *args, **options):
+        rebuilt = build_recommendations(full=options["full"], k=options["top_k"], min_support=options["min_support"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt recommendations for {rebuilt} clothing item(s)."))
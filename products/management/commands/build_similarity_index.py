@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from products.similarity import index_dir, refresh_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the content-based similarity index for the current catalog and save it where the workers "
+        "load it, so none of them has to build it. Run after deploys and bulk imports."
+    )
+
+    def handle(self, *args, **options):
+        index = refresh_index()
+        if index is None:
+            raise CommandError("Another process is building the similarity index.")
+        self.stdout.write(self.style.SUCCESS(
+            f"Similarity index for {len(index.item_ids)} item(s) written to {index_dir(index.version.identity)}."
+        ))
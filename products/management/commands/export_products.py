@@ -0,0 +1,23 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from products.bulk import FORMATS, export_rows
+from products.models import ClothingItem
+
+
+class Command(BaseCommand):
+    help = "Stream all clothing items to CSV or JSONL."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", dest="file_format", choices=FORMATS, default="csv")
+        parser.add_argument("--output", help="File to write; defaults to stdout.")
+
+    def handle(self, *args, **options):
+        stream = open(options["output"], "w", encoding="utf-8", newline="") if options["output"] else sys.stdout
+        try:
+            for chunk in export_rows(ClothingItem.objects.all(), options["file_format"]):
+                stream.write(chunk)
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
@@ -0,0 +1,38 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from products.images import process_item
+from products.models import ClothingItem
+
+
+class Command(BaseCommand):
+    help = "Generate resized WebP/JPEG variants for clothing item images that don't have them yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument("ids", nargs="*", type=int, help="Only process these clothing item ids.")
+        parser.add_argument("--force", action="store_true", help="Regenerate variants that already exist.")
+        parser.add_argument("--workers", type=int, default=4, help="Number of images processed in parallel.")
+
+    def handle(self, *args, **options):
+        queryset = ClothingItem.objects.exclude(image="")
+        if options["ids"]:
+            queryset = queryset.filter(pk__in=options["ids"])
+
+        pending = [
+            pk for pk, name, variants in queryset.values_list("pk", "image", "image_variants").iterator()
+            if options["force"] or variants.get("source") != name
+        ]
+
+        done = failed = 0
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            futures = {pk: executor.submit(process_item, pk) for pk in pending}
+            for pk, future in futures.items():
+                try:
+                    future.result()
+                    done += 1
+                except Exception as exc:
+                    failed += 1
+                    self.stderr.write(f"Item {pk}: {exc}")
+
+        self.stdout.write(self.style.SUCCESS(f"Generated variants for {done} item(s), {failed} failed."))
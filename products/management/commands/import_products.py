@@ -0,0 +1,33 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.bulk import FORMATS, guess_format, import_rows, read_rows
+
+
+class Command(BaseCommand):
+    help = "Import clothing items from a CSV or JSONL file in batched transactions."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or JSONL file to import.")
+        parser.add_argument("--format", dest="file_format", choices=FORMATS, help="Defaults to the file extension.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--create-categories", action="store_true", help="Create categories that don't exist yet.")
+
+    def handle(self, *args, **options):
+        file_format = options["file_format"] or guess_format(options["path"])
+        try:
+            with open(options["path"], encoding="utf-8-sig", newline="") as stream:
+                report = import_rows(
+                    read_rows(stream, file_format),
+                    batch_size=options["batch_size"],
+                    create_categories=options["create_categories"],
+                )
+        except OSError as exc:
+            raise CommandError(exc)
+
+        for error in report["errors"]:
+            self.stderr.write(f"Row {error['row']}: {json.dumps(error['errors'])}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {report['created']}, updated {report['updated']}, failed {report['failed']}."
+        ))
@@ -0,0 +1,18 @@
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand
+
+from products.trending import rebase
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the trending epoch to now and scale stored trending scores down to match. "
+        "Flushes do this automatically when needed; run it by hand after a long idle period if you like."
+    )
+
+    def handle(self, *args, **options):
+        epoch = rebase()
+        self.stdout.write(self.style.SUCCESS(
+            f"Trending epoch moved to {datetime.fromtimestamp(epoch, tz=timezone.utc):%Y-%m-%d %H:%M:%S} UTC."
+        ))
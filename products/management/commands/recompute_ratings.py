@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from products.models import ClothingItem
+from products.ratings import recompute_ratings
+
+
+class Command(BaseCommand):
+    help = "Recompute the stored review_count / rating_sum / average_rating of clothing items from their reviews."
+
+    def add_arguments(self, parser):
+        parser.add_argument("ids", nargs="*", type=int, help="Only recompute these clothing item ids.")
+
+    def handle(self, *args, **options):
+        queryset = ClothingItem.objects.all()
+        if options["ids"]:
+            queryset = queryset.filter(pk__in=options["ids"])
+        updated = recompute_ratings(queryset)
+        self.stdout.write(self.style.SUCCESS(f"Recomputed ratings for {updated} clothing item(s)."))
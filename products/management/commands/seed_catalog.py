@@ -0,0 +1,145 @@
+import random
+from decimal import Decimal
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from products.benchmark import SEED_PASSWORD, SEED_USER_PREFIX
+from products.cache import bump_catalog_version
+from products.models import Category, ClothingItem, Review, Wishlist
+from products.ratings import recompute_ratings
+from products.search import get_backend
+from products.similarity import bump_index_version
+from users.models import Profile
+
+CATEGORY_NAMES = [
+    "Sarees", "Lehenga", "Kurta", "Sherwani", "Salwar Suits", "Anarkali", "Gowns", "Dupattas",
+    "Blouses", "Jackets", "Dhoti", "Nehru Jackets", "Palazzos", "Tunics", "Co-ord Sets",
+]
+ADJECTIVES = [
+    "Elegant", "Charismatic", "Dazzling", "Gorgeous", "Ravishing", "Breathtaking", "Classic",
+    "Festive", "Royal", "Graceful", "Vibrant", "Minimal",
+]
+FABRICS = ["Silk", "Art Silk", "Organza", "Net", "Georgette", "Chinon", "Cotton", "Rayon", "Jacquard", "Lycra"]
+DETAILS = [
+    "embroidered", "sequins work", "stone work", "foil print", "beads", "zari weaving",
+    "mirror work", "hand block print", "lace border", "tassels",
+]
+OCCASIONS = ["wedding", "party", "festive", "casual", "reception", "office", "sangeet", "haldi"]
+COMMENTS = [
+    "Lovely fabric and fit.", "Colour is exactly as shown.", "Stitching could be better.",
+    "Perfect for the wedding season!", "Runs a little small.", "Great value for the price.",
+    "Delivery was quick and packaging was neat.", "Not as shiny as the pictures.",
+]
+# Ratings skew positive, as they do on real storefronts.
+RATING_WEIGHTS = [5, 7, 13, 30, 45]
+
+
+class Command(BaseCommand):
+    help = "Seed categories, clothing items, users, reviews and wishlists with realistic distributions for benchmarking."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--categories", type=int, default=15)
+        parser.add_argument("--items", type=int, default=5000)
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--reviews", type=int, default=20000)
+        parser.add_argument("--wishlists", type=int, default=10000)
+        parser.add_argument("--seed", type=int, default=42, help="Random seed, so runs are repeatable.")
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        batch_size = options["batch_size"]
+
+        with transaction.atomic():
+            categories = self.seed_categories(options["categories"])
+            items = self.seed_items(rng, categories, options["items"], batch_size)
+            users = self.seed_users(options["users"], batch_size)
+            weights = [item.popularity + 1 for item in items]
+            reviews = self.seed_pairs(rng, Review, users, items, weights, options["reviews"], batch_size)
+            wishlists = self.seed_pairs(rng, Wishlist, users, items, weights, options["wishlists"], batch_size)
+
+            # Bulk inserts skip the signal handlers that maintain these.
+            recompute_ratings()
+            get_backend().rebuild()
+            transaction.on_commit(bump_catalog_version)
+            transaction.on_commit(bump_index_version)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(categories)} categories, {len(items)} items, {len(users)} users, "
+            f"{reviews} reviews and {wishlists} wishlist entries."
+        ))
+
+    def seed_categories(self, count):
+        names = CATEGORY_NAMES[:count] + [f"Collection {n}" for n in range(max(0, count - len(CATEGORY_NAMES)))]
+        for name in names:
+            Category.objects.get_or_create(name=name)
+        return list(Category.objects.filter(name__in=names))
+
+    def seed_items(self, rng, categories, count, batch_size):
+        sizes = [value for value, _ in ClothingItem.SIZE_CHOICES]
+        colors = [value for value, _ in ClothingItem.COLOR_CHOICES]
+        # A few categories carry most of the catalog.
+        category_weights = [1 / (rank + 1) for rank in range(len(categories))]
+
+        items = []
+        for _ in range(count):
+            fabric, detail = rng.choice(FABRICS), rng.choice(DETAILS)
+            category = rng.choices(categories, category_weights)[0]
+            color = rng.choice(colors)
+            items.append(ClothingItem(
+                name=f"{rng.choice(ADJECTIVES)} {color} {fabric} {category.name}"[:100],
+                description=(
+                    f"{color} {fabric.lower()} {category.name.lower()} with {detail}, "
+                    f"ideal for {rng.choice(OCCASIONS)} wear. " * rng.randint(1, 4)
+                ).strip(),
+                # Prices are roughly log-normal around 1,500 with a long premium tail.
+                price=Decimal(min(99999, max(199, round(rng.lognormvariate(7.3, 0.7))))).quantize(Decimal("0.01")),
+                # Popularity is heavy-tailed: most items are rarely bought.
+                popularity=min(10**6, int(rng.paretovariate(1.2)) - 1),
+                image="products/clothing_images/OT84TW0.jpg",
+                category=category,
+                size=rng.choice(sizes),
+                color=color,
+            ))
+        return ClothingItem.objects.bulk_create(items, batch_size=batch_size)
+
+    def seed_users(self, count, batch_size):
+        start = User.objects.filter(username__startswith=SEED_USER_PREFIX).count()
+        password = make_password(SEED_PASSWORD)
+        users = User.objects.bulk_create(
+            [
+                User(username=f"{SEED_USER_PREFIX}{start + n}", email=f"{SEED_USER_PREFIX}{start + n}@example.com",
+                     password=password, is_active=True)
+                for n in range(count)
+            ],
+            batch_size=batch_size,
+        )
+        Profile.objects.bulk_create([Profile(user=user) for user in users], batch_size=batch_size)
+        return users
+
+    def seed_pairs(self, rng, model, users, items, weights, count, batch_size):
+        """Create up to ``count`` unique (user, item) rows, favouring popular items."""
+        if not users or not items:
+            return 0
+        cum_weights = list(accumulate(weights))
+        pairs = set()
+        for _ in range(5):
+            missing = count - len(pairs)
+            if missing <= 0:
+                break
+            picks = rng.choices(range(len(items)), cum_weights=cum_weights, k=missing)
+            pairs.update((rng.randrange(len(users)), item_index) for item_index in picks)
+        pairs = list(pairs)[:count]
+
+        rows = []
+        for user_index, item_index in pairs:
+            fields = {"user": users[user_index], "clothing_item": items[item_index]}
+            if model is Review:
+                fields["rating"] = rng.choices(range(1, 6), RATING_WEIGHTS)[0]
+                fields["comment"] = rng.choice(COMMENTS)
+            rows.append(model(**fields))
+        return len(model.objects.bulk_create(rows, batch_size=batch_size, ignore_conflicts=True))
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.15 on 2026-10-18 08:39
+
+from django.db import migrations, models
+from django.db.models import Avg, Count, Sum
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    ClothingItem = apps.get_model('products', 'ClothingItem')
+    Review = apps.get_model('products', 'Review')
+    stats = (
+        Review.objects.order_by()
+        .values('clothing_item')
+        .annotate(count=Count('id'), total=Sum('rating'), average=Avg('rating'))
+    )
+    for row in stats:
+        ClothingItem.objects.filter(pk=row['clothing_item']).update(
+            review_count=row['count'],
+            rating_sum=row['total'],
+            average_rating=row['average'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_remove_category_parent_alter_category_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clothingitem',
+            name='average_rating',
+            field=models.FloatField(default=0.0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='clothingitem',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='clothingitem',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.15 on 2026-10-18 08:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0012_clothingitem_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='clothingitem',
+            index=models.Index(fields=['price', 'id'], name='clothing_price_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clothingitem',
+            index=models.Index(fields=['popularity', 'id'], name='clothing_popularity_id_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS products_clothingitem_fts USING fts5("
+    "name, description, category, tokenize = 'unicode61 remove_diacritics 2')",
+    "INSERT INTO products_clothingitem_fts (rowid, name, description, category) "
+    "SELECT i.id, i.name, i.description, c.name FROM products_clothingitem i "
+    "LEFT JOIN products_category c ON c.id = i.category_id",
+]
+SQLITE_BACKWARD = ["DROP TABLE IF EXISTS products_clothingitem_fts"]
+
+POSTGRES_FORWARD = [
+    "CREATE TABLE IF NOT EXISTS products_clothingitem_search ("
+    "item_id bigint PRIMARY KEY REFERENCES products_clothingitem (id) ON DELETE CASCADE "
+    "DEFERRABLE INITIALLY DEFERRED, document tsvector NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS products_clothingitem_search_gin "
+    "ON products_clothingitem_search USING GIN (document)",
+    "INSERT INTO products_clothingitem_search (item_id, document) "
+    "SELECT i.id, setweight(to_tsvector('english', i.name), 'A') || "
+    "setweight(to_tsvector('english', coalesce(c.name, '')), 'B') || "
+    "setweight(to_tsvector('english', i.description), 'C') "
+    "FROM products_clothingitem i LEFT JOIN products_category c ON c.id = i.category_id",
+]
+POSTGRES_BACKWARD = ["DROP TABLE IF EXISTS products_clothingitem_search"]
+
+
+def run_for_vendor(statements):
+    def operation(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0013_clothingitem_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}),
+            run_for_vendor({'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRES_BACKWARD}),
+        ),
+    ]
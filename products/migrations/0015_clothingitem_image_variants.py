@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-18 08:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0014_clothingitem_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clothingitem',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.1.15 on 2026-10-18 08:48
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_rating_histogram(apps, schema_editor):
+    ClothingItem = apps.get_model('products', 'ClothingItem')
+    Review = apps.get_model('products', 'Review')
+    counts = Review.objects.order_by().values('clothing_item', 'rating').annotate(count=Count('id'))
+    for row in counts:
+        ClothingItem.objects.filter(pk=row['clothing_item']).update(**{f"rating_{row['rating']}_count": row['count']})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0015_clothingitem_image_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clothingitem',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='clothingitem',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='clothingitem',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='clothingitem',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='clothingitem',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['clothing_item', 'created_at', 'id'], name='review_item_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['clothing_item', 'rating', 'created_at', 'id'], name='review_item_rating_idx'),
+        ),
+        migrations.RunPython(backfill_rating_histogram, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.15 on 2026-10-18 08:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0016_rating_histogram'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingEpoch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='clothingitem',
+            name='trending_score',
+            field=models.FloatField(default=0.0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='clothingitem',
+            index=models.Index(fields=['trending_score', 'id'], name='clothing_trending_id_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.15 on 2026-10-18 08:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0017_trending_score'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clothingitem',
+            name='recommendations_stale',
+            field=models.BooleanField(default=True, editable=False),
+        ),
+        migrations.CreateModel(
+            name='ItemRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('clothing_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to='products.clothingitem')),
+                ('recommended', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.clothingitem')),
+            ],
+            options={
+                'unique_together': {('clothing_item', 'rank')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+from django.db import migrations, models
+
+import products.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0020_catalog_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='catalogversion',
+            name='identity',
+            field=models.CharField(default=products.models.new_catalog_identity, editable=False, max_length=32),
+        ),
+    ]
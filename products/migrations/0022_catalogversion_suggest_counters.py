@@ -0,0 +1,23 @@
+# Generated by Django 5.1.15 on 2026-10-18 09:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0021_catalogversion_identity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='catalogversion',
+            name='suggest_generation',
+            field=models.PositiveBigIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='catalogversion',
+            name='suggest_version',
+            field=models.PositiveBigIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-18 09:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0022_catalogversion_suggest_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='catalogversion',
+            name='similarity_version',
+            field=models.PositiveBigIntegerField(default=1),
+        ),
+    ]
@@ -1,4 +1,6 @@
-from django.db import models
+import secrets
+
+from django.db import models, transaction
 from django.contrib.auth.models import User
 
 class Category(models.Model):
@@ -34,17 +36,74 @@ class ClothingItem(models.Model):
     category = models.ForeignKey('Category', related_name='clothing_items', on_delete=models.CASCADE, default=1)
     size = models.CharField(max_length=3, choices=SIZE_CHOICES, default='M')
     color = models.CharField(max_length=20, choices=COLOR_CHOICES, default='Black')
+    # Denormalized review aggregates, maintained by products.ratings on every review write.
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    average_rating = models.FloatField(default=0.0, editable=False)
+    rating_1_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_2_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_3_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_4_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_5_count = models.PositiveIntegerField(default=0, editable=False)
+    # Resized copies of ``image`` written by products.images, keyed by format then width.
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    # Exponentially decayed event score relative to TrendingEpoch; see products.trending.
+    trending_score = models.FloatField(default=0.0, editable=False)
+    # Set when a wishlist or purchase touching this item changes; cleared by build_recommendations.
+    recommendations_stale = models.BooleanField(default=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    # Fields the "similar items" feature index is built from (see products.similarity).
+    CONTENT_FIELDS = ('name', 'description', 'price', 'category_id', 'size', 'color')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored content so a save can tell whether the similarity index needs rebuilding.
+        loaded = dict(zip(field_names, values))
+        if all(field in loaded for field in cls.CONTENT_FIELDS):
+            instance._loaded_content = tuple(loaded[field] for field in cls.CONTENT_FIELDS)
+        return instance
 
-    def average_rating(self):
-        ratings = self.reviews.all()
-        if ratings:
-            return sum([review.rating for review in ratings]) / len(ratings)
-        return 0.0
+    class Meta:
+        indexes = [
+            # Back the keyset orderings used by the catalog listing.
+            models.Index(fields=['price', 'id'], name='clothing_price_id_idx'),
+            models.Index(fields=['popularity', 'id'], name='clothing_popularity_id_idx'),
+            models.Index(fields=['trending_score', 'id'], name='clothing_trending_id_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
 
+def new_catalog_identity():
+    return secrets.token_hex(16)
+
+
+class CatalogVersion(models.Model):
+    """Single row counting catalog changes, kept in the database so every process and restart agrees on it."""
+    version = models.PositiveBigIntegerField(default=1)
+    # Random per database: versions start at 1 everywhere, so files labelled with one also carry this.
+    identity = models.CharField(max_length=32, default=new_catalog_identity, editable=False)
+    # Autocomplete index counters (products/suggest.py): saved items, and deletes or category changes.
+    suggest_version = models.PositiveBigIntegerField(default=1)
+    suggest_generation = models.PositiveBigIntegerField(default=1)
+    # Similarity index (products/similarity.py): saves that change ClothingItem.CONTENT_FIELDS.
+    similarity_version = models.PositiveBigIntegerField(default=1)
+
+    def __str__(self):
+        return f"Catalog version {self.version}"
+
+
+class TrendingEpoch(models.Model):
+    """Single row holding the time all stored trending scores are expressed relative to."""
+    started_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Trending epoch {self.started_at:%Y-%m-%d %H:%M}"
+
+
 class Review(models.Model):
     clothing_item = models.ForeignKey(ClothingItem, related_name='reviews', on_delete=models.CASCADE)
     user = models.ForeignKey(User, related_name='reviews', on_delete=models.CASCADE)
@@ -52,11 +111,30 @@ class Review(models.Model):
     rating = models.PositiveIntegerField(choices=[(i, i) for i in range(1, 6)])  
     created_at = models.DateTimeField(auto_now_add=True)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what was stored so an edit can move the item's rating aggregates by the difference.
+        loaded = dict(zip(field_names, values))
+        if 'clothing_item_id' in loaded and 'rating' in loaded:
+            instance._loaded_rating = (loaded['clothing_item_id'], loaded['rating'])
+        return instance
+
+    def save(self, *args, **kwargs):
+        # The post_save handler updates ClothingItem aggregates; keep both writes in one transaction.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     def __str__(self):
         return f'{self.user.username} review on {self.clothing_item.name}'
 
     class Meta:
         unique_together = ('clothing_item', 'user')
+        indexes = [
+            # Keyset orderings of the per-item reviews listing.
+            models.Index(fields=['clothing_item', 'created_at', 'id'], name='review_item_created_idx'),
+            models.Index(fields=['clothing_item', 'rating', 'created_at', 'id'], name='review_item_rating_idx'),
+        ]
 
 
 class Wishlist(models.Model):
@@ -69,3 +147,17 @@ class Wishlist(models.Model):
 
     def __str__(self):
         return f"Wishlist for {self.user.username} - {self.clothing_item.name}"
+
+
+class ItemRecommendation(models.Model):
+    """Precomputed "people who saved this also saved" neighbour; see products.recommendations."""
+    clothing_item = models.ForeignKey(ClothingItem, related_name='recommendations', on_delete=models.CASCADE)
+    recommended = models.ForeignKey(ClothingItem, related_name='+', on_delete=models.CASCADE)
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        unique_together = ('clothing_item', 'rank')
+
+    def __str__(self):
+        return f"{self.clothing_item_id} -> {self.recommended_id} ({self.score:.3f})"
@@ -0,0 +1,204 @@
+import json
+import math
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def _encode_value(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on a compound ordering, e.g. ("price", "id").
+
+    The cursor holds the ordering values of the last row seen and the next
+    page is selected with a row-value comparison against it, so page N costs
+    the same index range scan as page 1. The view provides the ordering via
+    ``get_keyset_ordering()``; its last field must be unique (normally "id").
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    invalid_cursor_message = "Invalid cursor"
+
+    def __init__(self):
+        self.page_size = getattr(settings, "CATALOG_PAGE_SIZE", 24)
+        self.max_page_size = getattr(settings, "CATALOG_MAX_PAGE_SIZE", 100)
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def decode_cursor(self, request, model=None):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            data = json.loads(urlsafe_b64decode(encoded.encode("ascii")))
+            values, reverse = data["v"], bool(data.get("r"))
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return self.clean_cursor_values(values, model), reverse
+
+    def clean_cursor_values(self, values, model):
+        """
+        Convert the cursor values to the types of their ordering fields. A
+        cursor is client input, so a value of the wrong type, or a
+        non-finite number, is refused rather than passed on to the query.
+        """
+        cleaned = []
+        for field, value in zip(self.ordering, values):
+            try:
+                model_field = model._meta.get_field(field.lstrip("-")) if model is not None else None
+            except FieldDoesNotExist:
+                # An annotation such as search_rank: a plain number.
+                model_field = None
+            try:
+                if model_field is not None:
+                    value = model_field.to_python(value)
+                elif isinstance(value, bool) or not isinstance(value, (int, float)):
+                    raise ValueError(value)
+            except (ValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+            if value is None or (isinstance(value, float) and not math.isfinite(value)) \
+                    or (isinstance(value, int) and not -2 ** 63 <= value < 2 ** 63):
+                raise NotFound(self.invalid_cursor_message)
+            cleaned.append(value)
+        return cleaned
+
+    def encode_cursor(self, values, reverse=False):
+        data = {"v": [_encode_value(value) for value in values]}
+        if reverse:
+            data["r"] = 1
+        encoded = urlsafe_b64encode(json.dumps(data, separators=(",", ":")).encode()).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    @staticmethod
+    def keyset_filter(ordering, values, reverse=False):
+        """
+        Build ``(a, b, c) > (x, y, z)`` as nested OR/AND conditions, honouring
+        the direction of each ordering field.
+        """
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, values):
+            descending = field.startswith("-")
+            name = field.lstrip("-")
+            lookup = "lt" if descending != reverse else "gt"
+            condition |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def row_values(self, index):
+        if self.page_values is not None:
+            return self.page_values[index]
+        return [getattr(self.page[index], field.lstrip("-")) for field in self.ordering]
+
+    def setup(self, request, view, model=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = tuple(view.get_keyset_ordering())
+        self.page_size_value = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request, model)
+        self.page_values = None
+
+    def finish(self, rows, has_more, reverse):
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+        return rows
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.setup(request, view, queryset.model)
+
+        ordering = self.ordering
+        reverse = False
+        if self.cursor is not None:
+            values, reverse = self.cursor
+            queryset = queryset.filter(self.keyset_filter(ordering, values, reverse))
+        if reverse:
+            ordering = tuple(f[1:] if f.startswith("-") else f"-{f}" for f in ordering)
+
+        rows = list(queryset.order_by(*ordering)[: self.page_size_value + 1])
+        has_more = len(rows) > self.page_size_value
+        rows = rows[: self.page_size_value]
+
+        self.page = self.finish(rows, has_more, reverse)
+        return self.page
+
+    def paginate_snapshot(self, snapshot, filters, queryset, request, view=None):
+        """
+        Same pages as ``paginate_queryset``, but the filtering, ordering and
+        keyset seek run on a products.snapshot.CatalogSnapshot; the database
+        only loads the page's rows by primary key.
+        """
+        self.setup(request, view, queryset.model)
+        values, reverse = self.cursor or (None, False)
+        try:
+            positions = snapshot.page(filters, self.ordering, values, reverse, self.page_size_value + 1)
+        except (TypeError, ValueError, ArithmeticError):
+            raise NotFound(self.invalid_cursor_message)
+        has_more = len(positions) > self.page_size_value
+        positions = positions[: self.page_size_value]
+
+        ids = snapshot.ids(positions)
+        objects = queryset.in_bulk(ids)
+        # Cursors carry the snapshot's values so the next page continues exactly where this one stopped.
+        rows = [(objects[pk], snapshot.values(position, self.ordering)) for pk, position in zip(ids, positions) if pk in objects]
+        rows = self.finish(rows, has_more, reverse)
+        self.page = [obj for obj, _ in rows]
+        self.page_values = [row_values for _, row_values in rows]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.row_values(-1))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.row_values(0), reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
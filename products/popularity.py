@@ -0,0 +1,274 @@
+"""
+Write-buffered popularity counters and trending scores.
+
+Views, wishlist additions and purchases call ``record()``, which only adds
+to counters in the cache: integer points for ``popularity`` and the
+decayed weight for ``trending_score`` (see products.trending), the latter
+in fixed point since cache increments are integers. Counters are grouped
+in windows of POPULARITY_FLUSH_INTERVAL seconds of wall-clock time, and
+each window keeps the list of items it has counters for.
+
+Every worker runs a background timer that calls ``flush()`` once per
+interval; a lock in the cache lets one of them through. The flush reads
+the windows that closed at least one interval ago (leaving time for
+writes already under way), writes them back as one batched UPDATE
+(``popularity = popularity + CASE ...``) and only then subtracts what it
+wrote from the counters, so a failed UPDATE is simply retried on the next
+flush, and increments that arrive meanwhile are kept.
+
+With a shared cache with atomic increments (Redis, memcached) pending
+events survive a worker that is killed outright: whichever worker flushes
+next writes them. The cache must have room to keep them, since an
+evicted counter is lost. A per-process cache (the default locmem) culls
+entries early, so the counters then go in an unbounded store of the
+process instead; they are lost with the process and flushed on a clean
+exit. Popularity is a ranking signal, not a ledger, and a crash between
+the UPDATE and the subtraction counts a window twice; that is accepted in
+exchange for never writing the same hot row once per event.
+"""
+import atexit
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models import Case, F, FloatField, Value, When
+from django.utils import timezone
+
+from . import trending
+from .cache import cache_is_shared
+from .models import ClothingItem
+
+logger = logging.getLogger(__name__)
+
+# Popularity points per event.
+EVENT_WEIGHTS = {
+    "view": 1,
+    "wishlist": 3,
+    "purchase": 5,
+}
+
+# Items per UPDATE statement; keeps the CASE and the IN list well below SQLite's variable limit.
+FLUSH_BATCH_SIZE = 400
+
+
+def flush_interval():
+    return getattr(settings, "POPULARITY_FLUSH_INTERVAL", 5.0)
+
+
+KEY_PREFIX = "popularity"
+FLUSHED_KEY = f"{KEY_PREFIX}:flushed"
+LOCK_KEY = f"{KEY_PREFIX}:flush-lock"
+# Trend weights are stored in fixed point with this many units per point.
+TREND_SCALE = 1_000_000
+# Windows kept in the cache, and looked back over when the flushed marker is missing.
+RETAIN_WINDOWS = 720
+
+
+def window_of(timestamp):
+    return int(timestamp // flush_interval())
+
+
+def window_anchor(window):
+    """Trend weights of a window are relative to its start."""
+    return window * flush_interval()
+
+
+def key_timeout():
+    return flush_interval() * RETAIN_WINDOWS
+
+
+def window_keys(window):
+    prefix = f"{KEY_PREFIX}:{window}"
+    return f"{prefix}:n", f"{prefix}:item:", f"{prefix}:points:", f"{prefix}:trend:"
+
+
+def add_to_counter(store, key, amount):
+    """Atomically add ``amount`` to a counter. Returns the new value and whether this call created it."""
+    try:
+        return store.incr(key, amount), False
+    except ValueError:
+        if store.add(key, amount, timeout=key_timeout()):
+            return amount, True
+        return store.incr(key, amount), False
+
+
+def apply_increments(increments, trend=None, anchor=None):
+    """
+    Add ``{item_id: points}`` to the stored popularity and, when given,
+    ``{item_id: weight}`` (relative to the unix time ``anchor``) to the
+    trending score. One UPDATE per batch of items.
+    """
+    trend = trend or {}
+    item_ids = sorted(set(increments) | set(trend))
+    updated = 0
+    with transaction.atomic():
+        if trend:
+            epoch = trending.current_epoch(for_update=True)
+            if trending.needs_rebase(epoch, anchor):
+                epoch = trending.rebase()
+            scale = trending.weight_at(anchor, epoch)
+        for start in range(0, len(item_ids), FLUSH_BATCH_SIZE):
+            batch = item_ids[start:start + FLUSH_BATCH_SIZE]
+            # Group the ids by increment so the CASE has one branch per distinct value, not per item.
+            by_points = defaultdict(list)
+            for item_id in batch:
+                if increments.get(item_id):
+                    by_points[increments[item_id]].append(item_id)
+            changes = {
+                "popularity": F("popularity") + Case(
+                    *[When(pk__in=ids, then=Value(points)) for points, ids in by_points.items()],
+                    default=Value(0),
+                ),
+                # Popularity is part of the item's JSON; see products/fragments.py.
+                "updated_at": timezone.now(),
+            }
+            if trend:
+                changes["trending_score"] = F("trending_score") + Case(
+                    *[When(pk=item_id, then=Value(trend[item_id] * scale)) for item_id in batch if item_id in trend],
+                    default=Value(0.0),
+                    output_field=FloatField(),
+                )
+            updated += ClothingItem.objects.filter(pk__in=batch).update(**changes)
+    return updated
+
+
+def read_window(store, window, count):
+    """
+    The pending ``({key: points}, {key: trend units})`` of a window with
+    ``count`` listed items, keyed by counter so the flush can subtract
+    exactly what it read.
+    """
+    _, item_prefix, points_prefix, trend_prefix = window_keys(window)
+    items = store.get_many([f"{item_prefix}{slot}" for slot in range(1, count + 1)])
+    item_ids = sorted(set(items.values()))
+    points = store.get_many([f"{points_prefix}{item_id}" for item_id in item_ids])
+    trend = store.get_many([f"{trend_prefix}{item_id}" for item_id in item_ids])
+    return {key: value for key, value in points.items() if value}, {key: value for key, value in trend.items() if value}
+
+
+def take(store, counters):
+    for key, value in counters.items():
+        try:
+            store.decr(key, value)
+        except ValueError:
+            pass
+
+
+def drop_window(store, window, count):
+    count_key, item_prefix, points_prefix, trend_prefix = window_keys(window)
+    items = store.get_many([f"{item_prefix}{slot}" for slot in range(1, count + 1)])
+    store.delete_many(
+        [count_key, *items]
+        + [f"{prefix}{item_id}" for item_id in set(items.values()) for prefix in (points_prefix, trend_prefix)]
+    )
+
+
+class PopularityBuffer:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Start empty; a forked child must not flush its parent's pending events a second time."""
+        self.lock = threading.Lock()
+        self.timer = None
+        # Used instead of a per-process cache, whose culling (MAX_ENTRIES) would drop pending counters.
+        self.local = LocMemCache(f"popularity-{os.getpid()}-{id(self)}", {"OPTIONS": {"MAX_ENTRIES": sys.maxsize}})
+
+    def store(self):
+        return cache if cache_is_shared() else self.local
+
+    def record(self, item_id, event="view", count=1):
+        points = EVENT_WEIGHTS[event] * count
+        if not item_id or points <= 0:
+            return
+        item_id = int(item_id)
+        store = self.store()
+        now = time.time()
+        window = window_of(now)
+        count_key, item_prefix, points_prefix, trend_prefix = window_keys(window)
+        _, created = add_to_counter(store, f"{points_prefix}{item_id}", points)
+        if created:
+            # First event for this item in the window: list it for the flush.
+            slot, _ = add_to_counter(store, count_key, 1)
+            store.set(f"{item_prefix}{slot}", item_id, timeout=key_timeout())
+        weight = points * trending.weight_at(now, window_anchor(window))
+        add_to_counter(store, f"{trend_prefix}{item_id}", round(weight * TREND_SCALE))
+        with self.lock:
+            self.ensure_timer()
+
+    def ensure_timer(self):
+        if self.timer is None or not self.timer.is_alive():
+            self.timer = threading.Thread(target=self.run_timer, name="popularity-flush", daemon=True)
+            self.timer.start()
+
+    def run_timer(self):
+        while True:
+            time.sleep(flush_interval())
+            self.flush()
+            close_old_connections()
+
+    def flush(self, everything=False):
+        """
+        Write the windows that have closed (every window, including the
+        current one, with ``everything``). Returns the number of items
+        updated, or 0 if another worker is flushing.
+        """
+        store = self.store()
+        if not store.add(LOCK_KEY, os.getpid(), timeout=max(60, flush_interval() * 2)):
+            return 0
+        try:
+            current = window_of(time.time())
+            closed = current - 2
+            last = current if everything else closed
+            flushed = store.get(FLUSHED_KEY)
+            first = (current - RETAIN_WINDOWS if flushed is None else flushed) + 1
+            windows = range(max(first, current - RETAIN_WINDOWS), last + 1)
+
+            counts = store.get_many([window_keys(window)[0] for window in windows])
+            counts = {window: counts[window_keys(window)[0]] for window in windows if counts.get(window_keys(window)[0])}
+            read = {window: read_window(store, window, count) for window, count in counts.items()}
+            increments, trend = Counter(), defaultdict(float)
+            anchor = window_anchor(last)
+            for window, (points, weights) in read.items():
+                scale = trending.weight_at(window_anchor(window), anchor) / TREND_SCALE
+                for key, value in points.items():
+                    increments[int(key.rsplit(":", 1)[1])] += value
+                for key, value in weights.items():
+                    trend[int(key.rsplit(":", 1)[1])] += value * scale
+            try:
+                updated = apply_increments(increments, trend, anchor) if increments or trend else 0
+            except DatabaseError:
+                logger.warning("Could not flush popularity for %d items; will retry", len(increments), exc_info=True)
+                return 0
+            for window, (points, weights) in read.items():
+                if window <= closed:
+                    drop_window(store, window, counts[window])
+                else:
+                    # Still open: keep the counters, less what was written, for the next flush.
+                    take(store, points)
+                    take(store, weights)
+            store.set(FLUSHED_KEY, closed, timeout=None)
+            return updated
+        finally:
+            store.delete(LOCK_KEY)
+
+
+buffer = PopularityBuffer()
+os.register_at_fork(after_in_child=buffer.reset)
+# Without a shared cache nobody else will flush this process's windows.
+atexit.register(lambda: cache_is_shared() or buffer.flush(everything=True))
+
+
+def record(item_id, event="view", count=1):
+    buffer.record(item_id, event, count)
+
+
+def flush(everything=True):
+    return buffer.flush(everything)
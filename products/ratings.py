@@ -0,0 +1,76 @@
+from django.db.models import Avg, Case, Count, F, FloatField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
+
+from .models import ClothingItem, Review
+
+STARS = range(1, 6)
+
+
+def histogram_field(stars):
+    return f"rating_{stars}_count"
+
+
+def apply_rating_change(item_id, added=None, removed=None):
+    """
+    Move the stored review aggregates of one item in a single UPDATE when a
+    review with rating ``added`` appears and/or one with ``removed`` goes.
+    The new average is computed by the database from the old column values,
+    so concurrent review writes never overwrite each other.
+    """
+    count_delta = (added is not None) - (removed is not None)
+    sum_delta = (added or 0) - (removed or 0)
+    count = F("review_count") + count_delta
+    total = F("rating_sum") + sum_delta
+    changes = {
+        "review_count": count,
+        "rating_sum": total,
+        "average_rating": Case(
+            When(review_count__lte=-count_delta, then=Value(0.0)),
+            default=Cast(total, FloatField()) / Cast(count, FloatField()),
+            output_field=FloatField(),
+        ),
+    }
+    if added != removed:
+        if added is not None:
+            changes[histogram_field(added)] = F(histogram_field(added)) + 1
+        if removed is not None:
+            changes[histogram_field(removed)] = F(histogram_field(removed)) - 1
+    changes["updated_at"] = timezone.now()
+    ClothingItem.objects.filter(pk=item_id).update(**changes)
+
+
+def recompute_ratings(queryset=None):
+    """
+    Rebuild the stored aggregates from the reviews table with one UPDATE.
+    Returns the number of items updated.
+    """
+    if queryset is None:
+        queryset = ClothingItem.objects.all()
+
+    reviews = (
+        Review.objects.filter(clothing_item=OuterRef("pk"))
+        .order_by()
+        .values("clothing_item")
+    )
+    histogram = {
+        histogram_field(stars): Coalesce(
+            Subquery(reviews.filter(rating=stars).annotate(c=Count("id")).values("c")), 0
+        )
+        for stars in STARS
+    }
+    return queryset.update(
+        review_count=Coalesce(Subquery(reviews.annotate(c=Count("id")).values("c")), 0),
+        rating_sum=Coalesce(Subquery(reviews.annotate(s=Sum("rating")).values("s")), 0),
+        average_rating=Coalesce(
+            Subquery(reviews.annotate(a=Avg("rating")).values("a")),
+            Value(0.0),
+            output_field=FloatField(),
+        ),
+        **histogram,
+        updated_at=timezone.now(),
+    )
+
+
+def rating_histogram(item):
+    return {stars: getattr(item, histogram_field(stars)) for stars in STARS}
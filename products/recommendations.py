@@ -0,0 +1,163 @@
+"""
+"People who saved this also saved" recommendations.
+
+build_recommendations() turns wishlists and purchases into a sparse
+user x item matrix ``X`` (1 where the user saved or bought the item) and
+computes item-item co-occurrence ``X.T @ X`` with SciPy. Scores are cosine
+similarities, ``cooccur(i, j) / sqrt(n_i * n_j)``, so a bestseller doesn't
+become everyone's neighbour. The top-K neighbours per item are stored as
+ItemRecommendation rows, and the product page reads them in one query (or
+none, from the response cache).
+
+Builds are incremental, and their scores approximate. A wishlist or
+purchase change marks every item the user holds as stale, because exactly
+those items' co-occurrence rows changed, and with them the items that
+list the added or removed item as a neighbour, whose score for it moved
+with that item's count. Only stale rows are recomputed:
+``X[:, stale].T @ X`` costs a fraction of the full product.
+
+The count also changes the score every other co-occurring item would
+give the item, so it may now belong in (or drop out of) the top-K of items
+that don't list it yet. Those rows are only corrected by a full build:
+schedule ``manage.py build_recommendations --full`` periodically (e.g.
+nightly) next to the frequent incremental runs.
+"""
+import logging
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from scipy import sparse
+
+from .cache import bump_catalog_version
+from .models import ClothingItem, ItemRecommendation, Wishlist
+
+logger = logging.getLogger(__name__)
+
+# Stale items whose co-occurrence rows are computed per matrix product.
+ROW_BATCH_SIZE = 1000
+
+
+def top_k():
+    return getattr(settings, "RECOMMENDATION_TOP_K", 12)
+
+
+def mark_stale(user_id, item_ids=()):
+    """
+    Flag every item ``user_id`` has saved or bought, ``item_ids`` (the items
+    saved, bought or removed) and the items listing those as a neighbour
+    for the next build.
+    """
+    from users.models import OrderLine
+
+    item_ids = list(item_ids)
+    held = Q(pk__in=Wishlist.objects.filter(user_id=user_id).values("clothing_item"))
+    held |= Q(pk__in=OrderLine.objects.filter(order__user_id=user_id).values("clothing_item"))
+    listing = Q(pk__in=ItemRecommendation.objects.filter(recommended__in=item_ids).values("clothing_item"))
+    ClothingItem.objects.filter(held | listing | Q(pk__in=item_ids)).update(recommendations_stale=True)
+
+
+def batches(ids):
+    for start in range(0, len(ids), ROW_BATCH_SIZE):
+        yield ids[start:start + ROW_BATCH_SIZE]
+
+
+def set_stale(item_ids, stale):
+    for batch in batches(item_ids):
+        ClothingItem.objects.filter(pk__in=batch).update(recommendations_stale=stale)
+
+
+def interaction_matrix():
+    """Return (binary CSC user x item matrix, item ids of its columns)."""
+    from users.models import OrderLine
+
+    pairs = [
+        np.array(list(Wishlist.objects.values_list("user_id", "clothing_item_id")), dtype=np.int64).reshape(-1, 2),
+        np.array(
+            list(OrderLine.objects.filter(clothing_item__isnull=False).values_list("order__user_id", "clothing_item_id")),
+            dtype=np.int64,
+        ).reshape(-1, 2),
+    ]
+    pairs = np.concatenate(pairs)
+    _, user_rows = np.unique(pairs[:, 0], return_inverse=True)
+    item_ids, item_columns = np.unique(pairs[:, 1], return_inverse=True)
+    matrix = sparse.csc_matrix(
+        (np.ones(len(pairs), dtype=np.float32), (user_rows, item_columns)),
+        shape=(user_rows.max(initial=-1) + 1, len(item_ids)),
+    )
+    # A user who both saved and bought an item still counts once.
+    matrix.data[:] = 1
+    return matrix, item_ids
+
+
+def neighbours(matrix, item_ids, columns, k, min_support):
+    """Yield (item id, [(neighbour id, score), ...]) for the given matrix columns."""
+    degrees = np.asarray(matrix.sum(axis=0)).ravel()
+    for batch in batches(columns):
+        cooccurrence = (matrix[:, batch].T @ matrix).tocsr()
+        for offset, column in enumerate(batch):
+            row = slice(cooccurrence.indptr[offset], cooccurrence.indptr[offset + 1])
+            others, counts = cooccurrence.indices[row], cooccurrence.data[row]
+            keep = (others != column) & (counts >= min_support)
+            others, counts = others[keep], counts[keep]
+            scores = counts / np.sqrt(degrees[column] * degrees[others])
+            if len(scores) > k:
+                best = np.argpartition(-scores, k - 1)[:k]
+                others, scores = others[best], scores[best]
+            # Highest score first; ties go to the more popular neighbour, then the lower id.
+            order = np.lexsort((item_ids[others], -degrees[others], -scores))
+            yield int(item_ids[column]), [(int(item_ids[others[i]]), float(scores[i])) for i in order]
+
+
+def build_recommendations(full=False, k=None, min_support=1):
+    """
+    Recompute the stored neighbours of stale items (all items with ``full``).
+    Returns the number of items rebuilt.
+    """
+    k = k or top_k()
+    targets = ClothingItem.objects.all() if full else ClothingItem.objects.filter(recommendations_stale=True)
+    target_ids = list(targets.values_list("pk", flat=True))
+    if not target_ids:
+        return 0
+    # Clear the flags before reading, so changes made while we compute flag the items again.
+    set_stale(target_ids, False)
+
+    try:
+        matrix, item_ids = interaction_matrix()
+        columns = np.flatnonzero(np.isin(item_ids, target_ids))
+        rows = []
+        for item_id, ranked in neighbours(matrix, item_ids, columns, k, min_support):
+            rows.extend(
+                ItemRecommendation(clothing_item_id=item_id, recommended_id=other, score=score, rank=rank)
+                for rank, (other, score) in enumerate(ranked, start=1)
+            )
+        with transaction.atomic():
+            stored = ItemRecommendation.objects.all()
+            if full:
+                stored.delete()
+            else:
+                for batch in batches(target_ids):
+                    stored.filter(clothing_item__in=batch).delete()
+            ItemRecommendation.objects.bulk_create(rows, batch_size=ROW_BATCH_SIZE)
+            transaction.on_commit(bump_catalog_version)
+    except Exception:
+        set_stale(target_ids, True)
+        raise
+
+    logger.info("Rebuilt recommendations for %d items (%d neighbours)", len(target_ids), len(rows))
+    return len(target_ids)
+
+
+def recommended_items(item):
+    """The stored neighbours of ``item`` as ClothingItems, best first, each with a ``score``."""
+    recommendations = (
+        ItemRecommendation.objects.filter(clothing_item=item)
+        .select_related("recommended__category")
+        .order_by("rank")
+    )
+    items = []
+    for recommendation in recommendations:
+        recommendation.recommended.score = round(recommendation.score, 4)
+        items.append(recommendation.recommended)
+    return items
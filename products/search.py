@@ -0,0 +1,196 @@
+import re
+
+from django.db import connections
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+ITEM_TABLE = "products_clothingitem"
+CATEGORY_TABLE = "products_category"
+SQLITE_TABLE = "products_clothingitem_fts"
+POSTGRES_TABLE = "products_clothingitem_search"
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+MAX_TERMS = 8
+
+
+def query_terms(query):
+    """Split a user query into plain word tokens; operators and quotes are dropped."""
+    return TOKEN_RE.findall(query.lower())[:MAX_TERMS]
+
+
+def no_matches(queryset):
+    # Still annotated, so ordering by search_rank works on an empty result too.
+    return queryset.none().annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+
+class SearchBackend:
+    """
+    Full-text index over clothing item name, description and category name.
+
+    ``search()`` narrows a ClothingItem queryset to the matches and annotates
+    each row with ``search_rank`` (higher is more relevant).
+    """
+
+    def __init__(self, using="default"):
+        self.using = using
+
+    def execute(self, sql, params=()):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(sql, params)
+
+    def index_items(self, ids):
+        raise NotImplementedError
+
+    def remove_items(self, ids):
+        raise NotImplementedError
+
+    def rebuild(self):
+        raise NotImplementedError
+
+    def search(self, queryset, query):
+        raise NotImplementedError
+
+
+class SQLiteSearchBackend(SearchBackend):
+    # Column weights for bm25(): name, description, category.
+    weights = (10.0, 1.0, 5.0)
+
+    def match_expression(self, terms):
+        return " ".join(f'"{term}"*' for term in terms)
+
+    def index_items(self, ids):
+        ids = list(ids)
+        if not ids:
+            return
+        placeholders = ", ".join(["%s"] * len(ids))
+        self.remove_items(ids)
+        self.execute(
+            f"INSERT INTO {SQLITE_TABLE} (rowid, name, description, category) "
+            f"SELECT i.id, i.name, i.description, c.name FROM {ITEM_TABLE} i "
+            f"LEFT JOIN {CATEGORY_TABLE} c ON c.id = i.category_id WHERE i.id IN ({placeholders})",
+            ids,
+        )
+
+    def remove_items(self, ids):
+        ids = list(ids)
+        if ids:
+            placeholders = ", ".join(["%s"] * len(ids))
+            self.execute(f"DELETE FROM {SQLITE_TABLE} WHERE rowid IN ({placeholders})", ids)
+
+    def rebuild(self):
+        self.execute(f"DELETE FROM {SQLITE_TABLE}")
+        self.execute(
+            f"INSERT INTO {SQLITE_TABLE} (rowid, name, description, category) "
+            f"SELECT i.id, i.name, i.description, c.name FROM {ITEM_TABLE} i "
+            f"LEFT JOIN {CATEGORY_TABLE} c ON c.id = i.category_id"
+        )
+
+    def search(self, queryset, query):
+        terms = query_terms(query)
+        if not terms:
+            return no_matches(queryset)
+        match = self.match_expression(terms)
+        weights = ", ".join(str(weight) for weight in self.weights)
+        return queryset.filter(
+            id__in=RawSQL(f"SELECT rowid FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s", [match])
+        ).annotate(
+            search_rank=RawSQL(
+                f"SELECT -bm25({SQLITE_TABLE}, {weights}) FROM {SQLITE_TABLE} "
+                f"WHERE {SQLITE_TABLE} MATCH %s AND rowid = {ITEM_TABLE}.id",
+                [match],
+                output_field=FloatField(),
+            )
+        )
+
+
+class PostgresSearchBackend(SearchBackend):
+    config = "english"
+
+    def document_sql(self):
+        return (
+            f"setweight(to_tsvector('{self.config}', i.name), 'A') || "
+            f"setweight(to_tsvector('{self.config}', coalesce(c.name, '')), 'B') || "
+            f"setweight(to_tsvector('{self.config}', i.description), 'C')"
+        )
+
+    def index_items(self, ids):
+        ids = list(ids)
+        if not ids:
+            return
+        self.execute(
+            f"INSERT INTO {POSTGRES_TABLE} (item_id, document) "
+            f"SELECT i.id, {self.document_sql()} FROM {ITEM_TABLE} i "
+            f"LEFT JOIN {CATEGORY_TABLE} c ON c.id = i.category_id WHERE i.id = ANY(%s) "
+            f"ON CONFLICT (item_id) DO UPDATE SET document = EXCLUDED.document",
+            [ids],
+        )
+
+    def remove_items(self, ids):
+        ids = list(ids)
+        if ids:
+            self.execute(f"DELETE FROM {POSTGRES_TABLE} WHERE item_id = ANY(%s)", [ids])
+
+    def rebuild(self):
+        self.execute(f"DELETE FROM {POSTGRES_TABLE}")
+        self.execute(
+            f"INSERT INTO {POSTGRES_TABLE} (item_id, document) "
+            f"SELECT i.id, {self.document_sql()} FROM {ITEM_TABLE} i "
+            f"LEFT JOIN {CATEGORY_TABLE} c ON c.id = i.category_id"
+        )
+
+    def search(self, queryset, query):
+        terms = query_terms(query)
+        if not terms:
+            return no_matches(queryset)
+        tsquery = " & ".join(f"{term}:*" for term in terms)
+        return queryset.filter(
+            id__in=RawSQL(
+                f"SELECT item_id FROM {POSTGRES_TABLE} WHERE document @@ to_tsquery('{self.config}', %s)",
+                [tsquery],
+            )
+        ).annotate(
+            search_rank=RawSQL(
+                f"SELECT ts_rank(document, to_tsquery('{self.config}', %s)) FROM {POSTGRES_TABLE} "
+                f"WHERE item_id = {ITEM_TABLE}.id",
+                [tsquery],
+                output_field=FloatField(),
+            )
+        )
+
+
+class FallbackSearchBackend(SearchBackend):
+    """Unindexed substring search for databases without a supported full-text engine."""
+
+    def index_items(self, ids):
+        pass
+
+    def remove_items(self, ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def search(self, queryset, query):
+        terms = query_terms(query)
+        if not terms:
+            return no_matches(queryset)
+        for term in terms:
+            queryset = queryset.filter(
+                Q(name__icontains=term) | Q(description__icontains=term) | Q(category__name__icontains=term)
+            )
+        return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+
+BACKENDS = {
+    "sqlite": SQLiteSearchBackend,
+    "postgresql": PostgresSearchBackend,
+}
+
+
+def get_backend(using="default"):
+    vendor = connections[using].vendor
+    return BACKENDS.get(vendor, FallbackSearchBackend)(using)
+
+
+def search_clothing_items(queryset, query):
+    return get_backend(queryset.db).search(queryset, query)
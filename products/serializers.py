@@ -1,19 +1,23 @@
+from django.core.files.storage import default_storage
 from rest_framework import serializers
 from .models import Category, ClothingItem, Review, Wishlist
 from rest_framework import serializers
 from .models import Review
 from .models import ClothingItem
+from .images import srcset
+from .fieldsets import SparseFieldsSerializerMixin
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Category
         fields = ['id', 'name']
 
 
-class ClothingItemSerializer(serializers.ModelSerializer):
-    category = CategorySerializer(read_only=True)  
-    average_rating = serializers.ReadOnlyField()
+class ClothingItemSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
+    category = CategorySerializer(read_only=True)
+    image_srcset = serializers.SerializerMethodField()
+    column_sources = {"image_srcset": ["image_variants"]}
 
     class Meta:
         model = ClothingItem
@@ -23,15 +27,24 @@ class ClothingItemSerializer(serializers.ModelSerializer):
             'description', 
             'price', 
             'image', 
+            'image_srcset',
             'category', 
             'size', 
             'color', 
             'average_rating',
+            'review_count',
             'popularity'
         ]
 
+    def get_image_srcset(self, obj):
+        request = self.context.get("request")
+        build_url = default_storage.url
+        if request is not None:
+            build_url = lambda path: request.build_absolute_uri(default_storage.url(path))
+        return srcset(obj.image_variants, build_url)
+
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     reviewer_name = serializers.CharField(source="user.username", read_only=True)
 
     class Meta:
@@ -42,19 +55,10 @@ class ReviewSerializer(serializers.ModelSerializer):
 
 
 
-class WishlistSerializer(serializers.ModelSerializer):
+class WishlistSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     clothing_item = ClothingItemSerializer(read_only=True)  
     user = serializers.StringRelatedField(read_only=True)  
 
     class Meta:
         model = Wishlist
         fields = ['id', 'user', 'clothing_item', 'created_at']
-
-
-class ClothingItemSerializer(serializers.ModelSerializer):
-    category = CategorySerializer(read_only=True)
-    average_rating = serializers.FloatField(read_only=True)
-
-    class Meta:
-        model = ClothingItem
-        fields = '__all__'
\ No newline at end of file
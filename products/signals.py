@@ -0,0 +1,90 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Category, ClothingItem, Review, Wishlist
+from .cache import bump_catalog_version
+from .images import schedule_variants
+from .ratings import apply_rating_change, recompute_ratings
+from .recommendations import mark_stale
+from .search import get_backend
+from .similarity import bump_index_version
+from .suggest import bump_suggest_generation, bump_suggest_version
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, created, **kwargs):
+    current = (instance.clothing_item_id, instance.rating)
+    if created:
+        apply_rating_change(instance.clothing_item_id, added=instance.rating)
+    else:
+        previous = getattr(instance, "_loaded_rating", None)
+        if previous is None:
+            # We don't know what was stored before; rebuild this item from its reviews.
+            recompute_ratings(ClothingItem.objects.filter(pk=instance.clothing_item_id))
+        elif previous[0] != current[0]:
+            apply_rating_change(previous[0], removed=previous[1])
+            apply_rating_change(current[0], added=current[1])
+        elif previous[1] != current[1]:
+            apply_rating_change(current[0], added=current[1], removed=previous[1])
+    instance._loaded_rating = current
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    previous = getattr(instance, "_loaded_rating", (instance.clothing_item_id, instance.rating))
+    apply_rating_change(previous[0], removed=previous[1])
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_save, sender=ClothingItem)
+def clothing_item_saved(sender, instance, created, using, **kwargs):
+    get_backend(using).index_items([instance.pk])
+    content = tuple(getattr(instance, field) for field in ClothingItem.CONTENT_FIELDS)
+    if created or getattr(instance, "_loaded_content", None) != content:
+        transaction.on_commit(bump_index_version)
+        transaction.on_commit(bump_suggest_version)
+    instance._loaded_content = content
+    if instance.image and instance.image_variants.get("source") != instance.image.name:
+        schedule_variants(instance.pk)
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_delete, sender=ClothingItem)
+def clothing_item_deleted(sender, instance, using, **kwargs):
+    get_backend(using).remove_items([instance.pk])
+    transaction.on_commit(bump_index_version)
+    transaction.on_commit(bump_suggest_generation)
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, created, using, **kwargs):
+    if not created:
+        # The category name is part of every item document in it.
+        items = ClothingItem.objects.using(using).filter(category=instance)
+        get_backend(using).index_items(items.values_list("pk", flat=True))
+        # ... and of their serialized JSON, which is versioned on updated_at.
+        items.update(updated_at=timezone.now())
+    transaction.on_commit(bump_catalog_version)
+    transaction.on_commit(bump_suggest_generation)
+
+
+@receiver(post_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    transaction.on_commit(bump_catalog_version)
+    transaction.on_commit(bump_suggest_generation)
+
+
+@receiver(post_save, sender=Wishlist)
+@receiver(post_delete, sender=Wishlist)
+def wishlist_changed(sender, instance, **kwargs):
+    mark_stale(instance.user_id, [instance.clothing_item_id])
+
+
+@receiver(post_save, sender="users.OrderLine")
+def order_line_saved(sender, instance, **kwargs):
+    if instance.clothing_item_id:
+        mark_stale(instance.order.user_id, [instance.clothing_item_id])
@@ -0,0 +1,283 @@
+"""
+Content-based "similar items".
+
+Every clothing item becomes one L2-normalized feature row built from its
+own fields. Weighted blocks make up the row:
+
+- one-hot category, colour and size
+- price, as a point on a quarter circle: log price is scaled to an angle,
+  so the dot product of two price blocks is cos(angle between them) and
+  falls off smoothly as the prices drift apart
+- TF-IDF of the name and description, over the SIMILARITY_MAX_TERMS most
+  common terms
+
+Rows are stacked in a SciPy CSR matrix, so similarity to every other item
+is one sparse matrix-vector product and a batch of items is one
+matrix-matrix product.
+
+The index is tagged with the database's identity and a version counter,
+both stored on the CatalogVersion row, so every worker agrees on it and
+an index saved for another database is never loaded. Saving an item
+bumps the counter only when one of ClothingItem.CONTENT_FIELDS changed,
+so review and popularity traffic never forces a rebuild.
+
+Building it (TF-IDF over every item) never happens on a request. The
+``build_similarity_index`` command, or a background thread in the worker
+that notices a new version, builds it and saves it to
+SIMILARITY_INDEX_DIR, where the other workers simply load it. Until the
+new index is ready, requests keep using the previous one (or the last
+saved one, in a fresh worker), and the view keeps such answers out of the
+response cache. A file lock stops two workers from building the same
+version at once. Each database saves into its own subdirectory.
+"""
+import logging
+import math
+import os
+import re
+import tempfile
+import threading
+from collections import Counter
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections
+from filelock import FileLock, Timeout
+from scipy import sparse
+
+from .cache import StoredVersion, bump_stored_counters, get_stored_counters
+from .models import ClothingItem
+
+BLOCK_WEIGHTS = {
+    "category": 1.0,
+    "color": 0.6,
+    "size": 0.3,
+    "price": 0.8,
+    "text": 1.0,
+}
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.npz"
+TOKEN_RE = re.compile(r"[a-z]{3,}")
+# Items scored per matrix product when computing neighbours for many items at once.
+BATCH_SIZE = 512
+
+
+def max_terms():
+    return getattr(settings, "SIMILARITY_MAX_TERMS", 5000)
+
+
+def index_root():
+    return getattr(settings, "SIMILARITY_INDEX_DIR", None) or os.path.join(settings.BASE_DIR, "var", "similarity-index")
+
+
+def index_dir(identity):
+    """Where the index of the database with ``identity`` is saved."""
+    return os.path.join(index_root(), identity)
+
+
+def get_index_version():
+    """The StoredVersion (database identity, similarity counter) the index must match."""
+    return StoredVersion(*get_stored_counters("identity", "similarity_version"))
+
+
+def bump_index_version():
+    bump_stored_counters("similarity_version")
+
+
+def one_hot(values, weight):
+    """Sparse one-hot block for a column of labels."""
+    labels, codes = np.unique(np.asarray(values, dtype=object).astype(str), return_inverse=True)
+    rows = np.arange(len(codes))
+    return sparse.csr_matrix((np.full(len(codes), weight, dtype=np.float32), (rows, codes)), shape=(len(codes), len(labels)))
+
+
+def price_block(prices, weight):
+    log_prices = np.log1p(np.asarray(prices, dtype=np.float64))
+    low, high = log_prices.min(initial=0.0), log_prices.max(initial=0.0)
+    angles = (log_prices - low) / (high - low or 1.0) * (math.pi / 2)
+    return sparse.csr_matrix(np.column_stack([np.cos(angles), np.sin(angles)]).astype(np.float32) * weight)
+
+
+def tfidf_block(documents, weight, vocabulary_size):
+    """Row-normalized TF-IDF over the ``vocabulary_size`` terms found in the most documents."""
+    tokenized = [Counter(TOKEN_RE.findall(document.lower())) for document in documents]
+    document_frequency = Counter(term for counts in tokenized for term in counts)
+    vocabulary = {
+        term: column
+        for column, (term, _) in enumerate(sorted(document_frequency.items(), key=lambda pair: (-pair[1], pair[0]))[:vocabulary_size])
+    }
+    rows, columns, values = [], [], []
+    for row, counts in enumerate(tokenized):
+        for term, count in counts.items():
+            column = vocabulary.get(term)
+            if column is not None:
+                rows.append(row)
+                columns.append(column)
+                values.append(1.0 + math.log(count))
+    matrix = sparse.csr_matrix(
+        (np.asarray(values, dtype=np.float32), (rows, columns)), shape=(len(documents), len(vocabulary))
+    )
+    frequencies = np.array([document_frequency[term] for term in vocabulary], dtype=np.float32)
+    idf = np.log((1 + len(documents)) / (1 + frequencies)) + 1
+    return normalize_rows(matrix @ sparse.diags(idf)) * weight
+
+
+def normalize_rows(matrix):
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.csr_matrix(sparse.diags(1 / norms) @ matrix)
+
+
+class FeatureIndex:
+    def __init__(self, item_ids, matrix, version):
+        self.item_ids = item_ids
+        self.matrix = matrix
+        self.matrix_t = matrix.T.tocsr()
+        self.version = version
+        self.positions = {int(item_id): position for position, item_id in enumerate(item_ids)}
+
+    @classmethod
+    def build(cls, version=None):
+        rows = list(ClothingItem.objects.order_by("pk").values_list("pk", *ClothingItem.CONTENT_FIELDS))
+        if not rows:
+            return cls(np.empty(0, dtype=np.int64), sparse.csr_matrix((0, 0), dtype=np.float32), version)
+        ids, names, descriptions, prices, categories, sizes, colors = zip(*rows)
+        matrix = sparse.hstack([
+            one_hot(categories, BLOCK_WEIGHTS["category"]),
+            one_hot(colors, BLOCK_WEIGHTS["color"]),
+            one_hot(sizes, BLOCK_WEIGHTS["size"]),
+            price_block(prices, BLOCK_WEIGHTS["price"]),
+            tfidf_block([f"{name} {description}" for name, description in zip(names, descriptions)],
+                        BLOCK_WEIGHTS["text"], max_terms()),
+        ], format="csr", dtype=np.float32)
+        return cls(np.asarray(ids, dtype=np.int64), normalize_rows(matrix), version)
+
+    def save(self, directory):
+        """Write the index to ``directory``, replacing the saved one atomically."""
+        os.makedirs(directory, exist_ok=True)
+        fd, temporary = tempfile.mkstemp(dir=directory, prefix=".index-", suffix=".npz")
+        with os.fdopen(fd, "wb") as output:
+            np.savez(
+                output, item_ids=self.item_ids, data=self.matrix.data, indices=self.matrix.indices,
+                indptr=self.matrix.indptr, shape=np.asarray(self.matrix.shape),
+                identity=np.asarray(self.version.identity), version=np.asarray(self.version.version),
+            )
+        os.replace(temporary, os.path.join(directory, INDEX_FILE))
+
+    @classmethod
+    def load(cls, directory):
+        """The saved index, or None if there is none (or it can't be read)."""
+        try:
+            with np.load(os.path.join(directory, INDEX_FILE)) as saved:
+                matrix = sparse.csr_matrix((saved["data"], saved["indices"], saved["indptr"]), shape=tuple(saved["shape"]))
+                version = StoredVersion(str(saved["identity"]), saved["version"].item())
+                return cls(saved["item_ids"], matrix, version)
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def neighbours(self, item_ids, k):
+        """Return {item id: [(neighbour id, score), ...]} for each indexed id, best first."""
+        positions = [self.positions[item_id] for item_id in item_ids if item_id in self.positions]
+        results = {}
+        for start in range(0, len(positions), BATCH_SIZE):
+            batch = positions[start:start + BATCH_SIZE]
+            scores = (self.matrix[batch] @ self.matrix_t).toarray()
+            scores[np.arange(len(batch)), batch] = -np.inf
+            count = min(k, scores.shape[1] - 1)
+            if count <= 0:
+                results.update((int(self.item_ids[position]), []) for position in batch)
+                continue
+            best = np.argpartition(-scores, count - 1, axis=1)[:, :count]
+            for row, position in enumerate(batch):
+                columns = best[row][np.argsort(-scores[row, best[row]], kind="stable")]
+                results[int(self.item_ids[position])] = [
+                    (int(self.item_ids[column]), round(float(scores[row, column]), 4)) for column in columns
+                ]
+        return results
+
+
+_index = None
+_index_lock = threading.Lock()
+_refreshing = None
+
+
+def refresh_index(version=None):
+    """
+    Make the current version the in-process index: load it if another
+    worker (or the command) saved it, otherwise build and save it. Returns
+    the index, or None if another worker holds the build lock.
+    """
+    global _index
+    version = get_index_version() if version is None else version
+    directory = index_dir(version.identity)
+    index = FeatureIndex.load(directory)
+    if index is None or index.version != version:
+        os.makedirs(directory, exist_ok=True)
+        try:
+            with FileLock(os.path.join(directory, ".build.lock"), timeout=0):
+                index = FeatureIndex.load(directory)
+                if index is None or index.version != version:
+                    index = FeatureIndex.build(version)
+                    index.save(directory)
+        except Timeout:
+            return None
+    with _index_lock:
+        _index = index
+    return index
+
+
+def _refresh_in_background():
+    try:
+        refresh_index()
+    except Exception:
+        logger.exception("Rebuilding the similarity index failed")
+    finally:
+        close_old_connections()
+
+
+def schedule_refresh():
+    """Start a background refresh unless one is already running in this process."""
+    global _refreshing
+    with _index_lock:
+        if _refreshing is not None and _refreshing.is_alive():
+            return
+        _refreshing = threading.Thread(target=_refresh_in_background, name="similarity-index", daemon=True)
+        _refreshing.start()
+
+
+def get_index():
+    """
+    The in-process index, or the saved one in a fresh worker; None if there
+    is neither yet. A refresh is started in the background whenever it is
+    not the current version, and the caller gets the previous index
+    meanwhile.
+    """
+    global _index
+    version = get_index_version()
+    index = _index
+    if index is None or index.version.identity != version.identity:
+        index = FeatureIndex.load(index_dir(version.identity))
+        with _index_lock:
+            _index = index
+    if index is None or index.version != version:
+        schedule_refresh()
+    return index
+
+
+def index_is_current(index):
+    return index is not None and index.version == get_index_version()
+
+
+def similar_items(item, k=None, index=None):
+    """The ``k`` most similar items to ``item`` in ``index``, best first, each with a ``score``."""
+    k = k or getattr(settings, "SIMILARITY_TOP_K", 12)
+    index = index or get_index()
+    ranked = index.neighbours([item.pk], k).get(item.pk, []) if index is not None else []
+    items = ClothingItem.objects.select_related("category").in_bulk([item_id for item_id, _ in ranked])
+    similar = []
+    for item_id, score in ranked:
+        if item_id in items:
+            items[item_id].score = score
+            similar.append(items[item_id])
+    return similar
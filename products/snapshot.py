@@ -0,0 +1,288 @@
+"""
+Memory-mapped columnar snapshot of the catalog for filtered, sorted listings.
+
+``build_snapshot()`` exports the listing columns of every ClothingItem
+into one directory of ``.npy`` files:
+
+- ``id`` and ``price`` (in cents)
+- ``category``, ``size`` and ``color`` as small integer codes
+- the category names as a UTF-8 string pool with an offsets array
+
+Workers open the files with ``np.load(mmap_mode="r")``. Every process on
+the host shares the same page-cache pages, and nothing is copied or
+unpickled.
+
+A snapshot belongs to one catalog version of one database: the counter
+and the random identity stored in the database
+(get_stored_catalog_version), which every process reads alike and which
+survive restarts. Snapshots live under CATALOG_SNAPSHOT_DIR in a
+directory named after the identity, so neither a snapshot left from
+before a restart nor one of another database is taken for the current
+catalog. A snapshot is written to a temporary directory, renamed into
+place and then published by atomically replacing the ``CURRENT`` pointer
+file. Readers therefore see either the old snapshot or the new one, never
+a partial write.
+
+Building never happens on a request. The ``build_catalog_snapshot``
+command, or a background thread in the worker that notices a new version,
+builds it, and a file lock stops two workers from building the same
+version at once. Until it is published the listing queries the database.
+
+Popularity and trending scores change with every flush of the buffered
+counters, which does not bump the catalog version, so those sorts always
+query the database (``serves()``).
+"""
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from decimal import ROUND_CEILING, ROUND_FLOOR, ROUND_HALF_EVEN, Decimal
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections
+from filelock import FileLock, Timeout
+
+from .cache import StoredVersion, get_stored_catalog_version
+from .models import Category, ClothingItem
+
+logger = logging.getLogger(__name__)
+
+POINTER = "CURRENT"
+SIZES = [value for value, _ in ClothingItem.SIZE_CHOICES]
+COLORS = [value for value, _ in ClothingItem.COLOR_CHOICES]
+
+# Listing sort field -> snapshot column.
+SORT_COLUMNS = {
+    "price": "price",
+    "id": "id",
+}
+
+_current = None
+_building = None
+_building_lock = threading.Lock()
+
+
+def snapshot_root():
+    return getattr(settings, "CATALOG_SNAPSHOT_DIR", None) or os.path.join(settings.BASE_DIR, "var", "catalog-snapshot")
+
+
+def snapshot_dir(identity):
+    """Where the snapshots of the database with ``identity`` live."""
+    return os.path.join(snapshot_root(), identity)
+
+
+def snapshot_enabled():
+    return getattr(settings, "CATALOG_SNAPSHOT_ENABLED", True)
+
+
+def to_cents(value, rounding=ROUND_HALF_EVEN):
+    return int((Decimal(value) * 100).to_integral_value(rounding=rounding))
+
+
+def string_pool(strings):
+    encoded = [value.encode() for value in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(value) for value in encoded])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def serves(ordering):
+    """Whether a listing in this keyset ordering can come from the snapshot."""
+    return all(field.lstrip("-") in SORT_COLUMNS for field in ordering)
+
+
+def build_snapshot(version=None):
+    """Write and publish a snapshot of the catalog as of ``version`` (a StoredVersion). Returns its directory."""
+    version = get_stored_catalog_version() if version is None else version
+    root = snapshot_dir(version.identity)
+    os.makedirs(root, exist_ok=True)
+
+    categories = list(Category.objects.order_by("pk").values_list("pk", "name"))
+    category_codes = {pk: code for code, (pk, _) in enumerate(categories)}
+    rows = list(ClothingItem.objects.order_by("pk").values_list("pk", "price", "category_id", "size", "color"))
+    size_codes = {value: code for code, value in enumerate(SIZES)}
+    color_codes = {value: code for code, value in enumerate(COLORS)}
+    ids, prices, category_ids, sizes, colors = zip(*rows) if rows else ([],) * 5
+    columns = {
+        "id": np.array(ids, dtype=np.int64),
+        "price": np.array([to_cents(price) for price in prices], dtype=np.int64),
+        "category": np.array([category_codes.get(pk, -1) for pk in category_ids], dtype=np.int32),
+        "size": np.array([size_codes.get(size, -1) for size in sizes], dtype=np.int8),
+        "color": np.array([color_codes.get(color, -1) for color in colors], dtype=np.int8),
+    }
+    columns["category_pool"], columns["category_offsets"] = string_pool(name.lower() for _, name in categories)
+
+    staging = tempfile.mkdtemp(dir=root, prefix=".build-")
+    for name, column in columns.items():
+        np.save(os.path.join(staging, f"{name}.npy"), column)
+    final = os.path.join(root, f"v{version.version}-{os.path.basename(staging)[len('.build-'):]}")
+    os.rename(staging, final)
+
+    fd, pointer = tempfile.mkstemp(dir=root, prefix=".pointer-")
+    with os.fdopen(fd, "w") as output:
+        json.dump({
+            "identity": version.identity, "version": version.version,
+            "path": os.path.basename(final), "items": len(rows),
+        }, output)
+    os.replace(pointer, os.path.join(root, POINTER))
+    prune(root, keep=os.path.basename(final))
+    return final
+
+
+def prune(root, keep, retain=2):
+    """Remove old snapshots, leaving the newest ``retain`` (readers may still map the previous one)."""
+    snapshots = sorted(
+        (entry for entry in os.scandir(root) if entry.is_dir() and entry.name.startswith("v")),
+        key=lambda entry: entry.stat().st_mtime,
+        reverse=True,
+    )
+    for entry in snapshots[retain:]:
+        if entry.name != keep:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+class CatalogSnapshot:
+    def __init__(self, path, version):
+        self.path = path
+        self.version = version
+        self.columns = {
+            name[:-4]: np.load(os.path.join(path, name), mmap_mode="r")
+            for name in os.listdir(path) if name.endswith(".npy")
+        }
+        pool, offsets = self.columns["category_pool"], self.columns["category_offsets"]
+        self.category_names = [
+            bytes(pool[offsets[code]:offsets[code + 1]]).decode() for code in range(len(offsets) - 1)
+        ]
+
+    @classmethod
+    def open_current(cls, identity):
+        root = snapshot_dir(identity)
+        try:
+            with open(os.path.join(root, POINTER)) as pointer:
+                data = json.load(pointer)
+            return cls(os.path.join(root, data["path"]), StoredVersion(data["identity"], data["version"]))
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def __len__(self):
+        return len(self.columns["id"])
+
+    def mask(self, filters):
+        """Boolean mask for the parsed listing filters (see ClothingItemViewSet.get_filter_values)."""
+        mask = np.ones(len(self), dtype=bool)
+        for name, choices in (("size", SIZES), ("color", COLORS)):
+            if filters.get(name) is not None:
+                code = choices.index(filters[name]) if filters[name] in choices else -2
+                mask &= self.columns[name] == code
+        if filters.get("category") is not None:
+            wanted = filters["category"].lower()
+            codes = [code for code, name in enumerate(self.category_names) if name == wanted]
+            mask &= np.isin(self.columns["category"], codes)
+        if filters.get("price_min") is not None:
+            mask &= self.columns["price"] >= to_cents(filters["price_min"], ROUND_CEILING)
+        if filters.get("price_max") is not None:
+            mask &= self.columns["price"] <= to_cents(filters["price_max"], ROUND_FLOOR)
+        return mask
+
+    def column(self, field):
+        return self.columns[SORT_COLUMNS[field]]
+
+    def encode_key(self, field, value):
+        return to_cents(value) if field == "price" else value
+
+    def decode_key(self, field, value):
+        if field == "price":
+            return (Decimal(int(value)) / 100).quantize(Decimal("0.01"))
+        return value.item() if hasattr(value, "item") else value
+
+    def page(self, filters, ordering, cursor=None, reverse=False, limit=24):
+        """
+        Positions of up to ``limit`` matching rows in keyset order, starting
+        after the ``cursor`` values (before them when ``reverse``).
+        """
+        mask = self.mask(filters)
+        fields = [(field.lstrip("-"), field.startswith("-") != reverse) for field in ordering]
+        if cursor is not None:
+            after = np.zeros(len(self), dtype=bool)
+            equal = np.ones(len(self), dtype=bool)
+            for (name, descending), value in zip(fields, cursor):
+                column, key = self.column(name), self.encode_key(name, value)
+                after |= equal & ((column < key) if descending else (column > key))
+                equal &= column == key
+            mask &= after
+        positions = np.flatnonzero(mask)
+        # lexsort sorts by the last key first; negate descending columns.
+        keys = [
+            -self.column(name)[positions] if descending else self.column(name)[positions]
+            for name, descending in reversed(fields)
+        ]
+        order = np.lexsort(keys) if positions.size else positions
+        return positions[order[:limit]]
+
+    def ids(self, positions):
+        return [int(pk) for pk in self.columns["id"][positions]]
+
+    def values(self, position, ordering):
+        return [self.decode_key(field.lstrip("-"), self.column(field.lstrip("-"))[position]) for field in ordering]
+
+
+def refresh_snapshot(version=None):
+    """
+    Build and publish the snapshot of the current catalog version unless
+    it already exists. Returns the snapshot, or None if another worker
+    holds the build lock.
+    """
+    version = get_stored_catalog_version() if version is None else version
+    root = snapshot_dir(version.identity)
+    os.makedirs(root, exist_ok=True)
+    try:
+        with FileLock(os.path.join(root, ".build.lock"), timeout=0):
+            snapshot = CatalogSnapshot.open_current(version.identity)
+            if snapshot is None or snapshot.version != version:
+                build_snapshot(version)
+    except Timeout:
+        return None
+    return CatalogSnapshot.open_current(version.identity)
+
+
+def _build_in_background():
+    try:
+        refresh_snapshot()
+    except Exception:
+        logger.exception("Building the catalog snapshot in %s failed", snapshot_root())
+    finally:
+        close_old_connections()
+
+
+def schedule_build():
+    """Start a background build unless one is already running in this process."""
+    global _building
+    with _building_lock:
+        if _building is not None and _building.is_alive():
+            return
+        _building = threading.Thread(target=_build_in_background, name="catalog-snapshot", daemon=True)
+        _building.start()
+
+
+def get_snapshot():
+    """
+    The snapshot for the current catalog version, or None if there is none
+    yet; callers then query the database. A missing or stale snapshot is
+    built in the background.
+    """
+    global _current
+    if not snapshot_enabled():
+        return None
+    version = get_stored_catalog_version()
+    if _current is not None and _current.version == version:
+        return _current
+
+    snapshot = CatalogSnapshot.open_current(version.identity)
+    if snapshot is None or snapshot.version != version:
+        schedule_build()
+        return None
+    _current = snapshot
+    return snapshot
@@ -0,0 +1,55 @@
+from itertools import islice
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+
+from Elisiyan.renderers import NDJSON_MEDIA_TYPE as NDJSON_CONTENT_TYPE
+from Elisiyan.renderers import NDJSONRenderer
+from Elisiyan.renderers import dumps as encode
+
+
+def serialized_chunks(queryset, serializer_class, context=None, chunk_size=500):
+    """
+    Read the queryset with ``iterator()`` (a server-side cursor on Postgres)
+    and serialize it ``chunk_size`` rows at a time, yielding lists of dicts.
+    Only one chunk of model instances is alive at any moment.
+    """
+    rows = queryset.iterator(chunk_size=chunk_size)
+    while chunk := list(islice(rows, chunk_size)):
+        yield serializer_class(chunk, many=True, context=context or {}).data
+
+
+def json_array_stream(chunks):
+    yield b"["
+    first = True
+    for chunk in chunks:
+        if not chunk:
+            continue
+        body = b",".join(encode(item) for item in chunk)
+        yield body if first else b"," + body
+        first = False
+    yield b"]"
+
+
+def ndjson_stream(chunks):
+    for chunk in chunks:
+        if chunk:
+            yield b"".join(encode(item) + b"\n" for item in chunk)
+
+
+def streaming_list_response(request, queryset, serializer_class, chunk_size=None):
+    """
+    Stream a serialized queryset as a JSON array, or as newline-delimited
+    JSON when content negotiation picked the NDJSON renderer
+    (``?format=ndjson`` or ``Accept: application/x-ndjson``), as for the
+    rest of the API.
+    """
+    chunk_size = chunk_size or getattr(settings, "STREAMING_CHUNK_SIZE", 500)
+    chunks = serialized_chunks(queryset, serializer_class, {"request": request}, chunk_size)
+    if isinstance(getattr(request, "accepted_renderer", None), NDJSONRenderer):
+        response = StreamingHttpResponse(ndjson_stream(chunks), content_type=NDJSON_CONTENT_TYPE)
+    else:
+        response = StreamingHttpResponse(json_array_stream(chunks), content_type="application/json")
+    patch_vary_headers(response, ("Accept",))
+    return response
@@ -0,0 +1,227 @@
+"""
+In-memory prefix index for search-box autocomplete.
+
+Each worker keeps a sorted list of the distinct lowercase word tokens of
+every item name. Each token has a posting list of ``(-popularity, id)``
+pairs kept in sorted order. A prefix lookup bisects to the range of tokens
+that start with it and lazily merges their posting lists. It stops after
+``limit`` distinct items, so the cost depends on the number of matching
+tokens and the limit, not on the catalog size. Category names get a
+smaller sorted list of their own.
+
+Memory per worker is bounded by the catalog: one tuple per (token, item)
+pair plus the item names. Tokens are capped at MAX_TOKEN_LENGTH
+characters and names at MAX_TOKENS_PER_ITEM tokens.
+
+Keeping it current across workers, through two counters on the
+CatalogVersion row, which every worker reads alike:
+
+- An item save that changes its content bumps ``suggest_version``. Each
+  worker then applies only the rows whose ``updated_at`` moved since its
+  last sync.
+- Deletes and category changes bump ``suggest_generation``, which forces
+  a full rebuild (both are rare).
+- A full rebuild also runs every SUGGEST_REFRESH_SECONDS to pick up
+  popularity, which the buffered counters update without saving items.
+
+A request reads the two counters (one primary-key lookup) and nothing
+else. Builds and syncs run in a background thread of the worker, and
+lookups keep using the previous index until it is done. Before its first
+build a worker has no index and the view answers 503.
+"""
+import bisect
+import heapq
+import logging
+import re
+import threading
+import time
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .cache import bump_stored_counters, get_stored_counters
+from .models import Category, ClothingItem
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+MAX_TOKEN_LENGTH = 32
+MAX_TOKENS_PER_ITEM = 16
+# Overlap between incremental syncs, covering clock differences between workers.
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+def tokenize(text):
+    return list(dict.fromkeys(token[:MAX_TOKEN_LENGTH] for token in TOKEN_RE.findall(text.lower())))[:MAX_TOKENS_PER_ITEM]
+
+
+def get_counters():
+    """The stored ``(generation, version)``."""
+    return get_stored_counters("suggest_generation", "suggest_version")
+
+
+def bump_suggest_version():
+    bump_stored_counters("suggest_version")
+
+
+def bump_suggest_generation():
+    bump_stored_counters("suggest_generation")
+
+
+class SuggestIndex:
+    def __init__(self, generation, version):
+        self.generation = generation
+        self.version = version
+        self.built_at = time.monotonic()
+        self.synced_at = timezone.now()
+        self.items = {}       # id -> (name, popularity, category_id, tokens)
+        self.tokens = []      # sorted distinct tokens
+        self.postings = {}    # token -> sorted [(-popularity, id), ...]
+        self.categories = []  # sorted [(lowercase name, name, id), ...]
+
+    @classmethod
+    def build(cls, generation, version):
+        index = cls(generation, version)
+        index.categories = sorted((name.lower(), name, pk) for pk, name in Category.objects.values_list("pk", "name"))
+        rows = ClothingItem.objects.values_list("pk", "name", "popularity", "category_id")
+        postings = {}
+        for pk, name, popularity, category_id in rows.iterator(chunk_size=5000):
+            tokens = tokenize(name)
+            index.items[pk] = (name, popularity, category_id, tokens)
+            for token in tokens:
+                postings.setdefault(token, []).append((-popularity, pk))
+        for entries in postings.values():
+            entries.sort()
+        index.postings = postings
+        index.tokens = sorted(postings)
+        return index
+
+    def remove(self, pk):
+        entry = self.items.pop(pk, None)
+        if entry is None:
+            return
+        _, popularity, _, tokens = entry
+        for token in tokens:
+            entries = self.postings[token]
+            position = bisect.bisect_left(entries, (-popularity, pk))
+            if position < len(entries) and entries[position] == (-popularity, pk):
+                del entries[position]
+            if not entries:
+                del self.postings[token]
+                del self.tokens[bisect.bisect_left(self.tokens, token)]
+
+    def upsert(self, pk, name, popularity, category_id):
+        self.remove(pk)
+        tokens = tokenize(name)
+        self.items[pk] = (name, popularity, category_id, tokens)
+        for token in tokens:
+            if token not in self.postings:
+                self.postings[token] = []
+                bisect.insort(self.tokens, token)
+            bisect.insort(self.postings[token], (-popularity, pk))
+
+    def token_range(self, prefix):
+        start = bisect.bisect_left(self.tokens, prefix)
+        end = bisect.bisect_left(self.tokens, prefix + "\U0010ffff", lo=start)
+        return self.tokens[start:end]
+
+    def suggest(self, query, limit=10):
+        """Items whose name has a token starting with the last query word and contains the others, most popular first."""
+        words = tokenize(query)
+        if not words:
+            return [], []
+        *complete, prefix = words
+        # Reads don't lock; a concurrent upsert can only make an entry vanish or show up twice, both handled below.
+        merged = heapq.merge(*(self.postings.get(token, ()) for token in self.token_range(prefix)))
+        seen = set()
+
+        def matches():
+            for _, pk in merged:
+                if pk in seen:
+                    continue
+                seen.add(pk)
+                entry = self.items.get(pk)
+                if entry is not None and all(word in entry[3] for word in complete):
+                    yield pk, entry[0], entry[2]
+
+        items = list(islice(matches(), limit))
+        phrase = " ".join(words)
+        start = bisect.bisect_left(self.categories, (phrase,))
+        categories = []
+        for lowered, name, pk in self.categories[start:]:
+            if not lowered.startswith(phrase) or len(categories) >= limit:
+                break
+            categories.append((pk, name))
+        return items, categories
+
+
+_index = None
+_lock = threading.Lock()
+_refreshing = None
+_refreshing_lock = threading.Lock()
+
+
+def refresh_seconds():
+    return getattr(settings, "SUGGEST_REFRESH_SECONDS", 300)
+
+
+def is_current(index, generation, version):
+    return (index.generation, index.version) == (generation, version) and time.monotonic() - index.built_at < refresh_seconds()
+
+
+def refresh_index():
+    """
+    Bring this worker's index up to the stored counters: rebuild it when
+    the generation moved or it is older than SUGGEST_REFRESH_SECONDS,
+    otherwise apply the rows saved since the last sync. Returns the index.
+    """
+    global _index
+    with _lock:
+        generation, version = get_counters()
+        index = _index
+        if index is None or index.generation != generation or time.monotonic() - index.built_at >= refresh_seconds():
+            # Built aside and swapped in, so lookups never see a partial index.
+            _index = SuggestIndex.build(generation, version)
+        elif index.version != version:
+            # Only items saved since the last sync changed; apply those rows.
+            started = timezone.now()
+            changed = ClothingItem.objects.filter(updated_at__gte=index.synced_at - SYNC_OVERLAP)
+            for pk, name, popularity, category_id in changed.values_list("pk", "name", "popularity", "category_id"):
+                index.upsert(pk, name, popularity, category_id)
+            index.synced_at = started
+            index.version = version
+        return _index
+
+
+def _refresh_in_background():
+    try:
+        refresh_index()
+    except Exception:
+        logger.exception("Refreshing the autocomplete index failed")
+    finally:
+        close_old_connections()
+
+
+def schedule_refresh():
+    """Start a background refresh unless one is already running in this process."""
+    global _refreshing
+    with _refreshing_lock:
+        if _refreshing is not None and _refreshing.is_alive():
+            return
+        _refreshing = threading.Thread(target=_refresh_in_background, name="suggest-index", daemon=True)
+        _refreshing.start()
+
+
+def get_index():
+    """
+    This worker's index, or None before its first build. When it is behind
+    the stored counters or due for a full rebuild, a refresh is started in
+    the background and the caller gets the current index meanwhile.
+    """
+    index = _index
+    if index is None or not is_current(index, *get_counters()):
+        schedule_refresh()
+    return index
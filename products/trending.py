@@ -0,0 +1,64 @@
+"""
+Time-decayed trending score.
+
+An event of weight ``w`` at time ``t`` should count ``w * exp(-(now - t) / tau)``
+towards an item's trend. Every item decays by the same factor, so the
+ranking is unchanged if each event is instead stored as
+``w * exp((t - epoch) / tau)`` for a shared epoch: old scores never need
+rewriting, new events simply count for more. The exponent grows with the
+distance from the epoch, so once it passes REBASE_EXPONENT the epoch is
+moved to now and every stored score is scaled down once, in one UPDATE.
+"""
+import math
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ClothingItem, TrendingEpoch
+
+# exp(50) ~ 5e21 keeps scores far from float overflow and precision loss.
+REBASE_EXPONENT = 50
+
+
+def decay_constant():
+    """tau in seconds, from the configured half-life."""
+    return getattr(settings, "TRENDING_HALF_LIFE_HOURS", 72.0) * 3600 / math.log(2)
+
+
+def current_epoch(for_update=False):
+    """
+    The epoch as a unix timestamp. ``for_update`` locks the row (where the
+    database supports it) so a concurrent rebase can't interleave with a
+    score update; call it inside a transaction.
+    """
+    queryset = TrendingEpoch.objects.select_for_update() if for_update else TrendingEpoch.objects.all()
+    epoch = queryset.order_by("pk").first()
+    if epoch is None:
+        epoch, _ = TrendingEpoch.objects.get_or_create(pk=1, defaults={"started_at": timezone.now()})
+    return epoch.started_at.timestamp()
+
+
+def weight_at(timestamp, anchor):
+    """Multiplier that expresses an event at ``timestamp`` relative to ``anchor``."""
+    return math.exp((timestamp - anchor) / decay_constant())
+
+
+def rebase(now=None):
+    """
+    Move the epoch to ``now`` and scale every score down by the decay since
+    the old epoch. Returns the new epoch as a unix timestamp.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        old = current_epoch(for_update=True)
+        factor = weight_at(old, now.timestamp())
+        ClothingItem.objects.filter(trending_score__gt=0).update(trending_score=F("trending_score") * factor)
+        TrendingEpoch.objects.update_or_create(pk=1, defaults={"started_at": now})
+    return now.timestamp()
+
+
+def needs_rebase(epoch, timestamp):
+    return (timestamp - epoch) / decay_constant() > REBASE_EXPONENT
+
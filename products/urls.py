@@ -8,6 +8,8 @@ from .views import (
     ReviewViewSet,
     AdminManageProducts,
     AdminDeleteProduct,
+    AdminImportProducts,
+    AdminExportProducts,
 )
 
 router = DefaultRouter()
@@ -21,5 +23,7 @@ urlpatterns = [
     path('reviews/create/', ReviewCreateView.as_view(), name='review-create'), 
     path('admin/manage-products/', AdminManageProducts.as_view(), name='admin_manage_products'),
     path('admin/delete-product/<int:product_id>/', AdminDeleteProduct.as_view(), name='admin_delete_product'),
+    path('admin/import-products/', AdminImportProducts.as_view(), name='admin_import_products'),
+    path('admin/export-products/', AdminExportProducts.as_view(), name='admin_export_products'),
 
 ]
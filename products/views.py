@@ -9,10 +9,12 @@ from django.db.models import Avg
 from django.http import Http404
 import django_filters
 from rest_framework.views import APIView
+from rest_framework.renderers import BrowsableAPIRenderer
 from django_filters import rest_framework as filters 
 from rest_framework.permissions import IsAuthenticated
 from .models import ClothingItem, Review, Category, Wishlist
 from .serializers import ClothingItemSerializer
+from .search import search_clothing_items
 
 
 
@@ -25,7 +27,8 @@ from .serializers import (
 from rest_framework.permissions import IsAdminUser
 
 class ClothingItemFilter(django_filters.FilterSet):
-    name = django_filters.CharFilter(field_name="name", lookup_expr="icontains")
+    q = django_filters.CharFilter(method="filter_search", label="Search")
+    name = django_filters.CharFilter(method="filter_search")
     size = django_filters.ChoiceFilter(choices=ClothingItem.SIZE_CHOICES)
     color = django_filters.ChoiceFilter(choices=ClothingItem.COLOR_CHOICES)
     category = django_filters.ModelChoiceFilter(queryset=Category.objects.all())
@@ -33,7 +36,10 @@ class ClothingItemFilter(django_filters.FilterSet):
     price_max = filters.NumberFilter(field_name="price", lookup_expr='lte', label="Maximum Price")
     class Meta:
         model = ClothingItem
-        fields = ["name", "size", "color", "category","popularity",'price_min', 'price_max']
+        fields = ["q", "name", "size", "color", "category","popularity",'price_min', 'price_max']
+
+    def filter_search(self, queryset, name, value):
+        return search_clothing_items(queryset, value)
 
 
 # Clothing Item ViewSet
@@ -48,80 +54,305 @@ from django.shortcuts import get_object_or_404
 from django.db.models import Avg
 from .models import ClothingItem
 from .serializers import ClothingItemSerializer
-
-
-class ClothingItemViewSet(ModelViewSet):
-    queryset = ClothingItem.objects.all()
+from .pagination import KeysetPagination
+from .facets import compute_facets
+from .cache import cached_catalog_response, catalog_cache_key, catalog_cache_timeout
+from .search import query_terms
+from django.core.cache import cache
+from django.db.models import Q
+from decimal import Decimal, InvalidOperation
+from django.http import StreamingHttpResponse
+from .streaming import streaming_list_response
+from .ratings import STARS, histogram_field, rating_histogram
+from .bulk import FORMATS, ID_MAX, export_rows, guess_format, import_rows, read_rows
+from . import popularity
+from .recommendations import recommended_items
+from .similarity import get_index as get_similarity_index
+from .similarity import index_is_current, similar_items
+from .snapshot import get_snapshot, serves as snapshot_serves
+from .fragments import FragmentJSONRenderer, FragmentNDJSONRenderer, serialize_items
+from .fieldsets import SparseFieldsMixin
+from .suggest import get_index as get_suggest_index
+from Elisiyan.db_router import ReplicaReadMixin
+
+FACET_CACHE_PARAMS = ("size", "color", "category", "price_min", "price_max")
+SUGGEST_MIN_PREFIX = 1
+SUGGEST_MAX_LIMIT = 20
+# Items per batch request; keeps its latency close to that of a single page.
+BATCH_MAX_SIZE = 100
+
+
+def parse_id(value):
+    """``value`` as an id in 1..ID_MAX, from an int or a string of digits, or None."""
+    if isinstance(value, str):
+        value = value.strip()
+        if not (value.isascii() and value.isdigit()) or len(value) > len(str(ID_MAX)):
+            return None
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int) or not 0 < value <= ID_MAX:
+        return None
+    return value
+
+
+class ClothingItemViewSet(ReplicaReadMixin, SparseFieldsMixin, ModelViewSet):
+    queryset = ClothingItem.objects.select_related("category")
     serializer_class = ClothingItemSerializer
     filterset_class = ClothingItemFilter
+    pagination_class = KeysetPagination
+    renderer_classes = [FragmentJSONRenderer, BrowsableAPIRenderer, FragmentNDJSONRenderer]
+    replica_actions = ("list", "retrieve", "facets", "suggest", "similar", "recommendations", "batch")
+    read_only_post_actions = ("batch",)
+    # The fragment cache versions each item's JSON on updated_at.
+    sparse_required_columns = ("updated_at",)
+
+    # Keyset orderings per sort_by value; the trailing id makes every ordering unique.
+    sort_orderings = {
+        "price": ("price", "id"),
+        "popularity": ("-popularity", "-id"),
+        "trending": ("-trending_score", "-id"),
+        "relevance": ("-search_rank", "id"),
+    }
 
     def get_permissions(self):
-        if self.action in ['list', 'retrieve']: 
+        if self.action in ['list', 'retrieve', 'facets', 'recommendations', 'similar', 'suggest', 'batch']: 
             return [AllowAny()]
         return [IsAdminUser()]  
 
     def get_queryset(self):
         queryset = super().get_queryset()
-        params = self.request.query_params
 
-        name = params.get("name")
-        if name:
-            queryset = queryset.filter(name__icontains=name)
+        query = self.get_search_query()
+        if query:
+            queryset = search_clothing_items(queryset, query)
 
-        size = params.get("size")
-        if size:
-            queryset = queryset.filter(size=size)
+        for condition in self.get_filter_conditions().values():
+            queryset = queryset.filter(condition)
 
-        color = params.get("color")
-        if color:
-            queryset = queryset.filter(color=color)
+        return self.sparse_queryset(queryset.order_by(*self.get_keyset_ordering()))
 
-        category = params.get("category")
-        if category:
-            queryset = queryset.filter(category__name__iexact=category)
+    def get_filter_values(self):
+        """The catalog filters from the query string, parsed and validated."""
+        params = self.request.query_params
+        values = {
+            "size": params.get("size") or None,
+            "color": params.get("color") or None,
+            "category": params.get("category") or None,
+        }
+        for param in ("price_min", "price_max"):
+            value = params.get(param)
+            try:
+                values[param] = Decimal(value) if value else None
+                if values[param] is not None and not values[param].is_finite():
+                    raise InvalidOperation
+            except InvalidOperation:
+                raise serializers.ValidationError({param: "A valid number is required."})
+        return values
+
+    def get_filter_conditions(self):
+        """
+        The catalog filters as one Q per facet, so the facet counts can leave
+        out a facet's own filter.
+        """
+        values = self.get_filter_values()
+        conditions = {}
 
-        sort_by = params.get("sort_by", "price")
-        if sort_by == "price":
-            queryset = queryset.order_by("price")
-        elif sort_by == "popularity":
-            queryset = queryset.order_by("-popularity")
+        if values["size"]:
+            conditions["size"] = Q(size=values["size"])
 
-        return queryset
+        if values["color"]:
+            conditions["color"] = Q(color=values["color"])
 
-    def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        if not queryset.exists():
-            return Response({"message": "No products available"}, status=status.HTTP_404_NOT_FOUND)
+        if values["category"]:
+            conditions["category"] = Q(category__name__iexact=values["category"])
 
-        for clothing_item in queryset:
-            avg_rating = clothing_item.reviews.aggregate(Avg("rating"))["rating__avg"]
-            clothing_item.average_rating = avg_rating if avg_rating else 0
+        price = Q()
+        for param, lookup in (("price_min", "price__gte"), ("price_max", "price__lte")):
+            if values[param] is not None:
+                price &= Q(**{lookup: values[param]})
+        if price:
+            conditions["price"] = price
 
-        serializer = self.get_serializer(queryset, many=True)
-        data = serializer.data
-        for i, item in enumerate(data):
-            item["average_rating"] = queryset[i].average_rating
+        return conditions
 
-        return Response(data)
+    def get_search_query(self):
+        # ``name`` is the older spelling of ``q`` and goes through the same index.
+        params = self.request.query_params
+        return (params.get("q") or params.get("name") or "").strip()
+
+    def get_keyset_ordering(self):
+        # Relevance needs words to rank by; "?q=!!" has none.
+        searching = bool(query_terms(self.get_search_query()))
+        default = "relevance" if searching else "price"
+        sort_by = self.request.query_params.get("sort_by", default)
+        if sort_by == "relevance" and not searching:
+            sort_by = "price"
+        return self.sort_orderings.get(sort_by, self.sort_orderings[default])
+
+    @cached_catalog_response
+    def list(self, request, *args, **kwargs):
+        # Filter/sort listings come from the shared catalog snapshot; search needs the database index,
+        # and popularity and trending scores change between catalog versions.
+        snapshot = None
+        if not self.get_search_query() and snapshot_serves(self.get_keyset_ordering()):
+            snapshot = get_snapshot()
+        if snapshot is not None:
+            page = self.paginator.paginate_snapshot(
+                snapshot, self.get_filter_values(), self.sparse_queryset(self.queryset.all()), request, view=self
+            )
+        else:
+            page = self.paginate_queryset(self.get_queryset())
+        if not page and self.paginator.cursor is None:
+            return Response({"message": "No products available"}, status=status.HTTP_404_NOT_FOUND)
+
+        # Each item's JSON is reused from the fragment cache until its row changes.
+        fields, exclude = self.get_fieldset()
+        data = serialize_items(page, self.get_serializer_class(), self.get_serializer_context(), fields=fields, exclude=exclude)
+        return self.get_paginated_response(data)
 
     def retrieve(self, request, *args, **kwargs):
+        response = self.cached_retrieve(request, *args, **kwargs)
+        # Counted outside the response cache so cached and 304 responses are views too.
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            popularity.record(kwargs.get("pk"), "view")
+        return response
+
+    @cached_catalog_response
+    def cached_retrieve(self, request, *args, **kwargs):
         pk = kwargs.get("pk")
-        clothing_item = get_object_or_404(self.queryset, pk=pk)
+        clothing_item = get_object_or_404(self.sparse_queryset(self.queryset), pk=pk)
+        serializer = self.get_serializer(clothing_item)
+        return Response(serializer.data)
 
-        avg_rating = clothing_item.reviews.aggregate(Avg("rating"))["rating__avg"]
-        clothing_item.average_rating = avg_rating if avg_rating else 0
+    def get_batch_ids(self, request):
+        """The requested ids, in order and without repeats: ?ids=1,2,3 or a POSTed {"ids": [...]}."""
+        raw = request.data.get("ids", "") if request.method == "POST" else request.query_params.get("ids", "")
+        if isinstance(raw, str):
+            raw = [value for value in raw.split(",") if value.strip()]
+        if not isinstance(raw, list):
+            raise serializers.ValidationError({"ids": "Expected a list of ids."})
+        invalid = [value for value in raw if parse_id(value) is None]
+        if invalid:
+            listed = ", ".join(str(value) for value in invalid[:10])
+            raise serializers.ValidationError({"ids": f"Every id must be an integer from 1 to {ID_MAX}; got {listed}."})
+        ids = list(dict.fromkeys(parse_id(value) for value in raw))
+        if not ids:
+            raise serializers.ValidationError({"ids": "At least one id is required."})
+        if len(ids) > BATCH_MAX_SIZE:
+            raise serializers.ValidationError({"ids": f"At most {BATCH_MAX_SIZE} ids per request."})
+        return ids
+
+    @action(detail=False, methods=["get", "post"])
+    def batch(self, request):
+        """
+        Many items in one request, in the order asked for, with the ids that
+        don't exist under "missing". One query: categories are joined and
+        ratings are stored on the item.
+        """
+        ids = self.get_batch_ids(request)
+        found = self.sparse_queryset(self.queryset).in_bulk(ids)
+        items = [found[pk] for pk in ids if pk in found]
+        fields, exclude = self.get_fieldset()
+        data = serialize_items(items, self.get_serializer_class(), self.get_serializer_context(), fields=fields, exclude=exclude)
+        return Response({"results": data, "missing": [pk for pk in ids if pk not in found]})
 
-        serializer = self.get_serializer(clothing_item)
-        data = serializer.data
-        data["average_rating"] = clothing_item.average_rating
+    @action(detail=True, methods=["get"])
+    @cached_catalog_response
+    def recommendations(self, request, pk=None):
+        """Items most often saved or bought together with this one, precomputed by build_recommendations."""
+        clothing_item = get_object_or_404(ClothingItem.objects.only("pk"), pk=pk)
+        items = recommended_items(clothing_item)
+        if items:
+            return self.scored_response(items)
+        # Items nobody has saved yet fall back to content similarity.
+        index = get_similarity_index()
+        return self.scored_response(similar_items(clothing_item, index=index), cacheable=index_is_current(index))
+
+    @action(detail=True, methods=["get"])
+    @cached_catalog_response
+    def similar(self, request, pk=None):
+        """Items closest in category, colour, size, price and description, from the in-memory feature index."""
+        clothing_item = get_object_or_404(ClothingItem.objects.only("pk"), pk=pk)
+        index = get_similarity_index()
+        if index is None:
+            return Response(
+                {"message": "Similar items are being prepared, try again shortly."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": "5"},
+            )
+        return self.scored_response(similar_items(clothing_item, index=index), cacheable=index_is_current(index))
+
+    def scored_response(self, items, cacheable=True):
+        data = self.get_serializer(items, many=True).data
+        for item, row in zip(items, data):
+            row["score"] = item.score
+        response = Response(data)
+        # An answer from an outdated similarity index must not outlive its rebuild.
+        response.cacheable = cacheable
+        return response
+
+    @action(detail=False, methods=["get"])
+    def suggest(self, request):
+        """Search-box autocomplete from the in-memory prefix index; reads only its counters from the database."""
+        prefix = request.query_params.get("prefix", "").strip()
+        if len(prefix) < SUGGEST_MIN_PREFIX:
+            return Response({"items": [], "categories": []})
+        try:
+            limit = min(int(request.query_params.get("limit", 10)), SUGGEST_MAX_LIMIT)
+        except ValueError:
+            limit = 10
+        index = get_suggest_index()
+        if index is None:
+            # This worker is building its first index in the background.
+            return Response(
+                {"message": "Suggestions are being prepared, try again shortly."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": "1"},
+            )
+        items, categories = index.suggest(prefix, max(limit, 1))
+        return Response({
+            "items": [{"id": pk, "name": name, "category": category_id} for pk, name, category_id in items],
+            "categories": [{"id": pk, "name": name} for pk, name in categories],
+        })
+
+    @action(detail=False, methods=["get"])
+    def facets(self, request):
+        """
+        Item counts per size, color, category and price bucket for the current filters.
+        """
+        # Keyed on the parsed filter values themselves: size and color match
+        # exactly, category case-insensitively.
+        values = self.get_filter_values()
+        key_params = {param: values[param] for param in FACET_CACHE_PARAMS}
+        if values["category"]:
+            key_params["category"] = values["category"].lower()
+        key_params["q"] = " ".join(query_terms(self.get_search_query()))
+        cache_key = catalog_cache_key("facets", key_params)
+
+        data = cache.get(cache_key)
+        if data is None:
+            queryset = ClothingItem.objects.all()
+            query = self.get_search_query()
+            if query:
+                queryset = search_clothing_items(queryset, query)
+            data = compute_facets(queryset, self.get_filter_conditions())
+            cache.set(cache_key, data, catalog_cache_timeout())
 
         return Response(data)
 
 
 # Category ViewSet
-class CategoryViewSet(ReadOnlyModelViewSet):
+class CategoryViewSet(ReplicaReadMixin, ReadOnlyModelViewSet):
     queryset = Category.objects.filter()
     serializer_class = CategorySerializer
+    replica_actions = ("list", "retrieve")
+
+    @cached_catalog_response
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cached_catalog_response
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
 
 # Review Create View
@@ -140,20 +371,45 @@ class ReviewCreateView(generics.CreateAPIView):
 
 # Review ViewSet
 
-class ReviewViewSet(viewsets.ModelViewSet):
-    queryset = Review.objects.all()
+class ReviewViewSet(ReplicaReadMixin, SparseFieldsMixin, viewsets.ModelViewSet):
+    queryset = Review.objects.select_related("user")
     serializer_class = ReviewSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]  
+    replica_actions = ("list", "retrieve", "reviews")
+
+    # Keyset orderings of the per-item reviews listing, backed by the Review indexes.
+    review_orderings = {
+        "newest": ("-created_at", "-id"),
+        "oldest": ("created_at", "id"),
+        "highest_rating": ("-rating", "-created_at", "-id"),
+        "lowest_rating": ("rating", "created_at", "id"),
+    }
+
+    def get_queryset(self):
+        return self.sparse_queryset(super().get_queryset())
+
+    def get_keyset_ordering(self):
+        sort_by = self.request.query_params.get("sort_by", "newest")
+        return self.review_orderings.get(sort_by, self.review_orderings["newest"])
 
     @action(detail=True, methods=["get"])
     def reviews(self, request, pk=None):
         """
-        Retrieve all reviews for a specific clothing item.
+        Retrieve the reviews for a specific clothing item, one cursor page at a time.
+        The item's stored star histogram is sent in the X-Rating-Histogram header.
         """
-        clothing_item = get_object_or_404(ClothingItem, pk=pk)
-        reviews = clothing_item.reviews.all()
-        serializer = ReviewSerializer(reviews, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        histogram_fields = [histogram_field(stars) for stars in STARS]
+        clothing_item = get_object_or_404(ClothingItem.objects.only("review_count", *histogram_fields), pk=pk)
+
+        paginator = KeysetPagination()
+        reviews = paginator.paginate_queryset(self.sparse_queryset(clothing_item.reviews.select_related("user")), request, view=self)
+        serializer = self.get_serializer(reviews, many=True)
+        response = paginator.get_paginated_response(serializer.data)
+        response["X-Rating-Histogram"] = ", ".join(
+            f"{stars}={count}" for stars, count in rating_histogram(clothing_item).items()
+        )
+        response["X-Review-Count"] = str(clothing_item.review_count)
+        return response
 
     def create(self, request, *args, **kwargs):
         """
@@ -179,15 +435,15 @@ class ReviewViewSet(viewsets.ModelViewSet):
 
 # Wishlist ViewSet
 
-class WishlistViewSet(viewsets.ModelViewSet):
-    queryset = Wishlist.objects.all()
+class WishlistViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
+    queryset = Wishlist.objects.select_related("user", "clothing_item__category")
     serializer_class = WishlistSerializer
     permission_classes = [IsAuthenticated]  
 
     def get_queryset(self):
         if not self.request.user.is_authenticated:
             return Wishlist.objects.none() 
-        return self.queryset.filter(user=self.request.user)
+        return self.sparse_queryset(self.queryset.filter(user=self.request.user))
 
     @action(detail=False, methods=["post"])
     def add_to_wishlist(self, request):
@@ -204,6 +460,7 @@ class WishlistViewSet(viewsets.ModelViewSet):
             )
 
         wishlist_item = Wishlist.objects.create(user=request.user, clothing_item=clothing_item)
+        popularity.record(clothing_item.pk, "wishlist")
         serializer = self.get_serializer(wishlist_item)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -239,9 +496,8 @@ class AdminManageProducts(APIView):
     permission_classes = [IsAdminUser]
 
     def get(self, request):
-        products =ClothingItem.objects.all()
-        serializer =ClothingItemSerializer(products, many=True)
-        return Response(serializer.data)
+        products = ClothingItem.objects.select_related("category").order_by("pk")
+        return streaming_list_response(request, products, ClothingItemSerializer)
 
     def post(self, request):
 
@@ -251,6 +507,42 @@ class AdminManageProducts(APIView):
             return Response(serializer.data, status=201)
         return Response(serializer.errors, status=400)
 
+class AdminImportProducts(APIView):
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response({"error": "Upload a CSV or JSONL file as 'file'."}, status=400)
+
+        file_format = request.data.get("file_format") or guess_format(upload.name)
+        if file_format not in FORMATS:
+            return Response({"error": f"file_format must be one of {', '.join(FORMATS)}."}, status=400)
+
+        try:
+            batch_size = min(max(int(request.data.get("batch_size", 1000)), 1), 5000)
+        except ValueError:
+            return Response({"error": "batch_size must be an integer."}, status=400)
+        create_categories = str(request.data.get("create_categories", "")).lower() in ("1", "true", "yes")
+
+        report = import_rows(read_rows(upload, file_format), batch_size=batch_size, create_categories=create_categories)
+        return Response(report, status=200)
+
+
+class AdminExportProducts(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        file_format = request.query_params.get("file_format", "csv")
+        if file_format not in FORMATS:
+            return Response({"error": f"file_format must be one of {', '.join(FORMATS)}."}, status=400)
+
+        content_type = "text/csv" if file_format == "csv" else "application/x-ndjson"
+        response = StreamingHttpResponse(export_rows(ClothingItem.objects.all(), file_format), content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="products.{file_format}"'
+        return response
+
+
 class AdminDeleteProduct(APIView):
     permission_classes = [IsAdminUser]
 
@@ -12,4 +12,13 @@ class UserAdmin(admin.ModelAdmin):
         return obj.user.last_name
     
 admin.site.register(models.Users,UserAdmin)
-admin.site.register(models.Profile)
\ No newline at end of file
+admin.site.register(models.Profile)
+admin.site.register(models.Order)
+admin.site.register(models.OrderLine)
+
+
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display=['subject','status','attempts','next_attempt_at','created_at','sent_at']
+    list_filter=['status']
+
+admin.site.register(models.OutboundEmail,OutboundEmailAdmin)
@@ -5,4 +5,7 @@ class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
     
-    
\ No newline at end of file
+    
+
+    def ready(self):
+        from . import signals  # noqa: F401
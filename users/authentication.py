@@ -0,0 +1,151 @@
+"""
+Token authentication without a database round trip per request.
+
+``CachedTokenAuthentication`` resolves a token to its user through three
+tiers:
+
+1. an in-process LRU with a TTL
+2. the shared Django cache
+3. the Token + User query DRF's TokenAuthentication runs
+
+Revocation has to reach every worker at once. A small generation counter
+therefore lives in the shared cache. Evicting a token deletes its shared
+entry and bumps the counter. Each process compares the counter on every
+lookup and drops its local entries when the counter has moved. A local
+hit therefore costs one cache GET instead of a query, and a revoked token
+is refused on its very next use. Revocations (logout, deactivation, deletion, permission
+changes) are rare, so clearing whole local caches is cheap.
+
+All of that needs a cache the workers share. With a per-process cache
+(locmem, the default) neither the counter nor an eviction reaches the
+other workers, so the shared tier is skipped and local entries live for
+AUTH_TOKEN_UNSHARED_LOCAL_TTL seconds only (1 by default, 0 to always
+query): a revoked token is then refused by every worker within that time.
+
+Lookups are counted in ``auth_token_cache_total{result=...}`` on /metrics.
+"""
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from Elisiyan.metrics import inc
+from products.cache import cache_is_shared
+
+GENERATION_KEY = "auth:token:generation"
+
+
+def token_cache_key(key):
+    # Hash the token so the raw credential never appears in cache keys or dumps.
+    return "auth:token:%s" % hashlib.sha256(key.encode()).hexdigest()
+
+
+def current_generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, 1, timeout=None)
+        generation = cache.get(GENERATION_KEY, 1)
+    return generation
+
+
+def local_ttl():
+    if cache_is_shared():
+        return getattr(settings, "AUTH_TOKEN_LOCAL_TTL", 60)
+    return getattr(settings, "AUTH_TOKEN_UNSHARED_LOCAL_TTL", 1)
+
+
+def bump_generation():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.add(GENERATION_KEY, 2, timeout=None)
+
+
+class LocalTokenCache:
+    """Thread-safe LRU of token key -> user with a per-entry TTL."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.generation = None
+
+    def get(self, key, generation):
+        with self.lock:
+            if generation != self.generation:
+                self.entries.clear()
+                self.generation = generation
+                return None
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, user = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return user
+
+    def set(self, key, user, generation, ttl):
+        with self.lock:
+            if generation != self.generation:
+                self.entries.clear()
+                self.generation = generation
+            self.entries[key] = (time.monotonic() + ttl, user)
+            self.entries.move_to_end(key)
+            while len(self.entries) > getattr(settings, "AUTH_TOKEN_LOCAL_CACHE_SIZE", 1024):
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+local_cache = LocalTokenCache()
+
+
+def evict_token(key):
+    """Forget ``key`` everywhere; the next request with it goes to the database."""
+    cache.delete(token_cache_key(key))
+    bump_generation()
+    local_cache.clear()
+
+
+def evict_user(user_id):
+    for key in Token.objects.filter(user_id=user_id).values_list("key", flat=True):
+        evict_token(key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        shared, ttl = cache_is_shared(), local_ttl()
+        generation = current_generation()
+        user = local_cache.get(key, generation) if ttl > 0 else None
+        if user is not None:
+            inc("auth_token_cache_total", result="local_hit")
+        else:
+            user = cache.get(token_cache_key(key)) if shared else None
+            if user is not None:
+                inc("auth_token_cache_total", result="shared_hit")
+            else:
+                inc("auth_token_cache_total", result="miss")
+                user, _ = super().authenticate_credentials(key)
+                if shared:
+                    cache.set(token_cache_key(key), user, getattr(settings, "AUTH_TOKEN_CACHE_TIMEOUT", 300))
+                    if current_generation() != generation:
+                        # Revoked while we were reading it; don't leave the stale copy behind.
+                        cache.delete(token_cache_key(key))
+            if ttl > 0:
+                local_cache.set(key, user, generation, ttl)
+
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed("User inactive or deleted.")
+        # Views may set attributes on request.user; never hand out the cached instance itself.
+        user = copy.copy(user)
+        return user, Token(key=key, user=user)
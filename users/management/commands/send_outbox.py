@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from users.outbox import send_pending
+
+
+class Command(BaseCommand):
+    help = "Send pending outbox emails in batches over one connection, retrying failures with backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, help="Messages per connection (default: EMAIL_OUTBOX_BATCH_SIZE).")
+        parser.add_argument("--loop", action="store_true", help="Keep polling instead of exiting once the outbox is drained.")
+        parser.add_argument("--interval", type=float, default=5.0, help="Seconds between polls with --loop.")
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = send_pending(options["batch_size"])
+            total_sent += sent
+            total_failed += failed
+            if sent or failed:
+                self.stdout.write(f"Sent {sent}, failed {failed}.")
+            if sent + failed == 0:
+                if not options["loop"]:
+                    break
+                close_old_connections()
+                time.sleep(options["interval"])
+        self.stdout.write(self.style.SUCCESS(f"Outbox drained: {total_sent} sent, {total_failed} failed."))
@@ -0,0 +1,97 @@
+# Generated by Django 5.1.15 on 2026-10-18 08:49
+
+import re
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+# Lines were written by PurchaseView as "Purchased {item} for {amount} on {%Y-%m-%d %H:%M:%S}".
+HISTORY_LINE = re.compile(r"^Purchased (?P<item>.+) for (?P<amount>\S+) on (?P<date>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})$")
+
+
+def buy_history_to_orders(apps, schema_editor):
+    Profile = apps.get_model('users', 'Profile')
+    Order = apps.get_model('users', 'Order')
+    OrderLine = apps.get_model('users', 'OrderLine')
+    ClothingItem = apps.get_model('products', 'ClothingItem')
+
+    def find_item(text):
+        if text.isdigit():
+            item = ClothingItem.objects.filter(pk=int(text)).first()
+            if item:
+                return item
+        return ClothingItem.objects.filter(name__iexact=text).order_by('pk').first()
+
+    for profile in Profile.objects.exclude(buy_history='').iterator():
+        for line in profile.buy_history.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            match = HISTORY_LINE.match(line)
+            item_name, amount, created_at = line, Decimal('0'), profile.created_at
+            if match:
+                item_name = match['item']
+                created_at = datetime.strptime(match['date'], '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+                try:
+                    amount = Decimal(match['amount']).quantize(Decimal('0.01'))
+                except InvalidOperation:
+                    pass
+            item = find_item(item_name) if match else None
+            order = Order.objects.create(user_id=profile.user_id, total=amount, created_at=created_at)
+            OrderLine.objects.create(order=order, clothing_item=item, item_name=item_name[:255], amount=amount)
+
+
+def orders_to_buy_history(apps, schema_editor):
+    Profile = apps.get_model('users', 'Profile')
+    OrderLine = apps.get_model('users', 'OrderLine')
+    for profile in Profile.objects.iterator():
+        lines = OrderLine.objects.filter(order__user_id=profile.user_id).select_related('order').order_by('order__created_at', 'pk')
+        profile.buy_history = "\n".join(
+            f"Purchased {line.item_name} for {line.amount} on {line.order.created_at:%Y-%m-%d %H:%M:%S}" for line in lines
+        )
+        profile.save(update_fields=['buy_history'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0016_rating_histogram'),
+        ('users', '0004_alter_profile_buy_history'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Order',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='orders', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OrderLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_name', models.CharField(max_length=255)),
+                ('quantity', models.PositiveIntegerField(default=1)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('clothing_item', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='order_lines', to='products.clothingitem')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='users.order')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', 'created_at'], name='order_user_created_idx'),
+        ),
+        migrations.RunPython(buy_history_to_orders, orders_to_buy_history),
+        migrations.RemoveField(
+            model_name='profile',
+            name='buy_history',
+        ),
+    ]
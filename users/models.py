@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 class Users(models.Model):
     user =models.OneToOneField(User,on_delete=models.CASCADE)
@@ -11,11 +12,72 @@ class Users(models.Model):
     
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="profile")
-    buy_history = models.TextField(default="", blank=True)  
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return self.user.username
+
+
+class Order(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="orders")
+    total = models.DecimalField(max_digits=12, decimal_places=2)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='order_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Order {self.pk} by {self.user.username}"
+
+
+class OrderLine(models.Model):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="lines")
+    # Kept when the product is deleted; item_name records what was bought.
+    clothing_item = models.ForeignKey(
+        'products.ClothingItem', null=True, blank=True, on_delete=models.SET_NULL, related_name="order_lines"
+    )
+    item_name = models.CharField(max_length=255)
+    quantity = models.PositiveIntegerField(default=1)
+    # Paid for the whole line, not per item.
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.quantity} x {self.item_name}"
+
+
+class OutboundEmail(models.Model):
+    """Outbox row; users.outbox sends pending rows so requests never wait on SMTP."""
+    PENDING = "pending"
+    SENT = "sent"
+    DEAD = "dead"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (SENT, "Sent"),
+        (DEAD, "Dead"),
+    ]
+
+    to = models.JSONField(default=list)
+    subject = models.CharField(max_length=255)
+    body = models.TextField(blank=True)
+    html_body = models.TextField(blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # Set by the worker that holds the row until next_attempt_at; a crashed worker's claim just expires.
+    claimed_by = models.CharField(max_length=64, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_status_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
     
 
     
@@ -0,0 +1,113 @@
+"""
+Transactional email outbox.
+
+``enqueue()`` stores a message as an OutboundEmail row, normally inside the
+transaction that creates whatever the email is about. The message exists
+exactly when that data commits, and the request never talks to SMTP.
+
+``send_pending()`` (run by ``manage.py send_outbox``) claims a batch of
+due rows and sends them over one connection of the configured
+EMAIL_BACKEND. A failed message is retried with exponential backoff and
+jitter. After EMAIL_OUTBOX_MAX_ATTEMPTS failures it is marked dead and
+left for an admin to inspect. Rows are claimed with a lease (claimed_by +
+next_attempt_at), so several workers can drain the outbox at once, and
+rows held by a worker that crashed become due again when the lease runs
+out.
+"""
+import logging
+import random
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+# How long a claimed row stays invisible to other workers.
+CLAIM_LEASE = timedelta(minutes=5)
+
+
+def enqueue(subject, to, body="", html_body=""):
+    return OutboundEmail.objects.create(subject=subject, to=list(to), body=body, html_body=html_body)
+
+
+def max_attempts():
+    return getattr(settings, "EMAIL_OUTBOX_MAX_ATTEMPTS", 8)
+
+
+def retry_delay(attempts):
+    """Exponential backoff from EMAIL_OUTBOX_RETRY_DELAY seconds, capped at a day, with +-20% jitter."""
+    base = getattr(settings, "EMAIL_OUTBOX_RETRY_DELAY", 60)
+    delay = min(base * 2 ** (attempts - 1), 24 * 3600)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def claim(batch_size):
+    """Take up to ``batch_size`` due messages for this worker."""
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    due = OutboundEmail.objects.filter(status=OutboundEmail.PENDING, next_attempt_at__lte=now)
+    ids = list(due.order_by("next_attempt_at", "pk").values_list("pk", flat=True)[:batch_size])
+    # Another worker may have claimed some of these since; the filter makes the claim conditional.
+    due.filter(pk__in=ids).update(claimed_by=token, next_attempt_at=now + CLAIM_LEASE)
+    return list(OutboundEmail.objects.filter(claimed_by=token, status=OutboundEmail.PENDING).order_by("pk"))
+
+
+def build_message(outbound, connection):
+    message = EmailMultiAlternatives(outbound.subject, outbound.body, to=outbound.to, connection=connection)
+    if outbound.html_body:
+        message.attach_alternative(outbound.html_body, "text/html")
+    return message
+
+
+def record_failure(outbound, error):
+    outbound.attempts += 1
+    outbound.last_error = f"{type(error).__name__}: {error}"[:2000]
+    outbound.claimed_by = ""
+    if outbound.attempts >= max_attempts():
+        outbound.status = OutboundEmail.DEAD
+        logger.error("Giving up on email %s to %s after %d attempts: %s",
+                     outbound.pk, outbound.to, outbound.attempts, outbound.last_error)
+    else:
+        outbound.next_attempt_at = timezone.now() + retry_delay(outbound.attempts)
+    outbound.save(update_fields=["attempts", "last_error", "claimed_by", "status", "next_attempt_at"])
+
+
+def send_pending(batch_size=None):
+    """Send one batch of due messages. Returns (sent, failed)."""
+    batch = claim(batch_size or getattr(settings, "EMAIL_OUTBOX_BATCH_SIZE", 50))
+    if not batch:
+        return 0, 0
+
+    sent = failed = 0
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as error:
+        # The server is unreachable: every message in the batch failed this attempt.
+        for outbound in batch:
+            record_failure(outbound, error)
+        return 0, len(batch)
+
+    try:
+        for outbound in batch:
+            try:
+                build_message(outbound, connection).send()
+            except Exception as error:
+                record_failure(outbound, error)
+                failed += 1
+                continue
+            OutboundEmail.objects.filter(pk=outbound.pk).update(
+                status=OutboundEmail.SENT, sent_at=timezone.now(), claimed_by="", attempts=outbound.attempts + 1
+            )
+            sent += 1
+    finally:
+        try:
+            connection.close()
+        except Exception:
+            logger.warning("Error closing the email connection", exc_info=True)
+    return sent, failed
@@ -1,7 +1,7 @@
 from rest_framework import serializers
 from .import models
 from django.contrib.auth.models import User
-from .models import Profile
+from .models import Order, OrderLine, Profile
 
 class UserSerializer(serializers.ModelSerializer):
     user = serializers.StringRelatedField(many=False)
@@ -62,5 +62,19 @@ class AdminSerializer(serializers.ModelSerializer):
 class ProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model = Profile
-        fields = ['user', 'buy_history', 'created_at']
-        depth = 1  
\ No newline at end of file
+        fields = ['user', 'created_at']
+        depth = 1
+
+
+class OrderLineSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OrderLine
+        fields = ['clothing_item', 'item_name', 'quantity', 'amount']
+
+
+class OrderSerializer(serializers.ModelSerializer):
+    lines = OrderLineSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Order
+        fields = ['id', 'total', 'created_at', 'lines']  
\ No newline at end of file
@@ -0,0 +1,25 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import evict_token, evict_user
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    # Evict now and again after commit, so no request can re-cache the token in between.
+    # delete() clears instance.key (the primary key), so keep our own copy.
+    key = instance.key
+    evict_token(key)
+    transaction.on_commit(lambda: evict_token(key))
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    # Cached tokens carry a copy of the user; any change but the login timestamp
+    # (is_active, is_staff, ...) must be seen on the next request.
+    if created or update_fields == frozenset({"last_login"}):
+        return
+    transaction.on_commit(lambda: evict_user(instance.pk))
@@ -1,3 +1,173 @@
-from django.test import TestCase
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from smtplib import SMTPException
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from . import outbox
+from .authentication import local_cache, token_cache_key
+from .models import Order, OutboundEmail, Profile
+
+
+class PurchaseTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("shopper", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def purchase(self, amount, **fields):
+        return self.client.post("/users/purchase/", {"item": "Kurta", "amount": amount, **fields}, format="json")
+
+    def test_records_order(self):
+        response = self.purchase("99.999", quantity=2)
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get(pk=response.json()["order_id"])
+        self.assertEqual(str(order.total), "100.00")
+        self.assertEqual(order.lines.get().quantity, 2)
+
+    def test_rejects_invalid_amounts(self):
+        for amount in ("NaN", "sNaN", "Infinity", "-Infinity", "abc", "-1", "1e10", "1e30"):
+            self.assertEqual(self.purchase(amount).status_code, 400, amount)
+        for quantity in (0, 1001, "99999999999999999999", 5000000000, None, "two"):
+            self.assertEqual(self.purchase("10", quantity=quantity).status_code, 400, quantity)
+        self.assertFalse(Order.objects.exists())
+
+    def test_amount_is_the_line_total(self):
+        response = self.purchase("30.00", quantity=3)
+        order = Order.objects.get(pk=response.json()["order_id"])
+        line = order.lines.get()
+        self.assertEqual((order.total, line.amount, line.quantity), (Decimal("30.00"), Decimal("30.00"), 3))
+
+
+class TokenRevocationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        self.user = User.objects.create_user("shopper", password="pw")
+        Profile.objects.create(user=self.user)
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def profile_status(self):
+        return self.client.get("/users/profile/").status_code
+
+    def shared_cache(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        return override_settings(CACHES={"default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": directory.name,
+        }})
+
+    def assertRevokedImmediately(self):
+        self.assertEqual(self.profile_status(), 200)
+        self.assertEqual(self.profile_status(), 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.profile_status(), 401)
+
+        self.user.is_active = True
+        self.user.save()
+        self.assertEqual(self.profile_status(), 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+        self.assertEqual(self.profile_status(), 401)
+
+    def test_revocation_is_immediate(self):
+        self.assertRevokedImmediately()
+
+    def test_revocation_is_immediate_with_shared_cache(self):
+        with self.shared_cache():
+            self.assertRevokedImmediately()
+
+    def test_per_process_cache_skips_the_shared_tier(self):
+        self.assertEqual(self.profile_status(), 200)
+        self.assertIsNone(cache.get(token_cache_key(self.token.key)))
+        with self.shared_cache():
+            local_cache.clear()
+            self.assertEqual(self.profile_status(), 200)
+            self.assertIsNotNone(cache.get(token_cache_key(self.token.key)))
+
+    @override_settings(AUTH_TOKEN_UNSHARED_LOCAL_TTL=0)
+    def test_revocation_other_workers_cannot_announce(self):
+        self.assertEqual(self.profile_status(), 200)
+        # As if another worker deactivated the user: no eviction reaches this process.
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.profile_status(), 401)
+
+
+@override_settings(EMAIL_OUTBOX_RETRY_DELAY=60, EMAIL_OUTBOX_MAX_ATTEMPTS=3)
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.first = outbox.enqueue("Welcome", ["first@example.com"], body="Hi")
+        self.second = outbox.enqueue("Welcome", ["second@example.com"], body="Hi", html_body="<p>Hi</p>")
+
+    def make_due(self, outbound):
+        OutboundEmail.objects.filter(pk=outbound.pk).update(next_attempt_at=timezone.now())
+
+    def test_sends_due_messages_once(self):
+        self.assertEqual(outbox.send_pending(), (2, 0))
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), ["first@example.com", "second@example.com"])
+        self.assertEqual(set(OutboundEmail.objects.values_list("status", "attempts", "claimed_by")), {("sent", 1, "")})
+        self.assertEqual(outbox.send_pending(), (0, 0))
+
+    def test_failure_backs_off_then_gives_up(self):
+        real_build = outbox.build_message
+
+        def build(outbound, connection):
+            message = real_build(outbound, connection)
+            if outbound.pk == self.first.pk:
+                message.send = mock.Mock(side_effect=SMTPException("mailbox full"))
+            return message
+
+        with mock.patch("users.outbox.build_message", build):
+            self.assertEqual(outbox.send_pending(), (1, 1))
+            self.first.refresh_from_db()
+            self.assertEqual((self.first.status, self.first.attempts, self.first.claimed_by), ("pending", 1, ""))
+            self.assertIn("mailbox full", self.first.last_error)
+            delay = (self.first.next_attempt_at - timezone.now()).total_seconds()
+            self.assertTrue(40 < delay <= 72, delay)
+            # Not due yet.
+            self.assertEqual(outbox.send_pending(), (0, 0))
+
+            self.make_due(self.first)
+            self.assertEqual(outbox.send_pending(), (0, 1))
+            self.make_due(self.first)
+            with self.assertLogs("users.outbox", "ERROR"):
+                self.assertEqual(outbox.send_pending(), (0, 1))
+            self.first.refresh_from_db()
+            self.assertEqual((self.first.status, self.first.attempts), ("dead", 3))
+            self.make_due(self.first)
+            self.assertEqual(outbox.send_pending(), (0, 0))
+
+    def test_unreachable_server_fails_the_whole_batch(self):
+        with mock.patch("django.core.mail.backends.locmem.EmailBackend.open", side_effect=OSError("refused")):
+            self.assertEqual(outbox.send_pending(), (0, 2))
+        self.assertEqual(set(OutboundEmail.objects.values_list("status", "attempts")), {("pending", 1)})
+
+    def test_claims_are_leased(self):
+        claimed = outbox.claim(batch_size=1)
+        self.assertEqual([outbound.pk for outbound in claimed], [self.first.pk])
+        # Another worker skips the leased row...
+        self.assertEqual([outbound.pk for outbound in outbox.claim(batch_size=10)], [self.second.pk])
+        self.assertEqual(outbox.claim(batch_size=10), [])
+        # ... until the lease of a worker that died runs out.
+        OutboundEmail.objects.filter(pk=self.first.pk).update(
+            next_attempt_at=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertEqual([outbound.pk for outbound in outbox.claim(batch_size=10)], [self.first.pk])
+
+    def test_retry_delay_grows_and_is_capped(self):
+        for attempts, expected in ((1, 60), (3, 240), (30, 24 * 3600)):
+            seconds = outbox.retry_delay(attempts).total_seconds()
+            self.assertTrue(0.8 * expected <= seconds <= 1.2 * expected, (attempts, seconds))
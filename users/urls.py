@@ -14,4 +14,5 @@ urlpatterns = [
     path('admin/manage-users/', views.AdminManageUsers.as_view(), name='admin_manage_users'),
     # path('admin/delete-user/<int:user_id>/', views.AdminDeleteUser.as_view(), name='admin_delete_user'),
     path('profile/', views.UserProfileView.as_view(), name='profile'),
+    path('purchase/', views.PurchaseView.as_view(), name='purchase'),
 ]
@@ -8,19 +8,24 @@ from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_encode,urlsafe_base64_decode
 from django.utils.encoding import force_bytes
 from rest_framework import status
-from django.core.mail import EmailMultiAlternatives
+from . import outbox
 from django.template.loader import render_to_string
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate,login,logout
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.authentication import TokenAuthentication
+from .authentication import CachedTokenAuthentication
 from django.utils.encoding import force_str
 from rest_framework.authtoken.models import Token
 from rest_framework.exceptions import AuthenticationFailed
 from django.urls import reverse
-from .models import Profile
+from .models import Order, OrderLine, Profile
 from rest_framework.permissions import IsAdminUser
-from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from products.models import ClothingItem
+from products.pagination import KeysetPagination
+from products import popularity
+from products.streaming import streaming_list_response
 
 
 class UserRegistrationApiView(APIView):
@@ -29,16 +34,16 @@ class UserRegistrationApiView(APIView):
     def post(self, request):
         serializer = self.serializer_class(data=request.data)
         if serializer.is_valid():
-            user = serializer.save()
-            Profile.objects.create(user=user)
-            token = default_token_generator.make_token(user)
-            uid = urlsafe_base64_encode(force_bytes(user.pk))
-            confirm_link = f"https://elisiyan.onrender.com/users/active/{uid}/{token}"
-            email_subject = "Confirm Your Email"
-            email_body = render_to_string('auth_email.html', {'confirm_link': confirm_link})
-            email = EmailMultiAlternatives(email_subject, '', to=[user.email])
-            email.attach_alternative(email_body, "text/html")
-            email.send()
+            # The confirmation email is queued with the user, not sent here: send_outbox delivers it.
+            with transaction.atomic():
+                user = serializer.save()
+                Profile.objects.create(user=user)
+                token = default_token_generator.make_token(user)
+                uid = urlsafe_base64_encode(force_bytes(user.pk))
+                confirm_link = f"https://elisiyan.onrender.com/users/active/{uid}/{token}"
+                email_subject = "Confirm Your Email"
+                email_body = render_to_string('auth_email.html', {'confirm_link': confirm_link})
+                outbox.enqueue(email_subject, [user.email], html_body=email_body)
 
             return Response({"message": "Check your mail for confirmation"}, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -88,7 +93,7 @@ class UserLoginApiView(APIView):
 
 class UserLogoutView(APIView):
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
 
     def post(self, request):
         if not request.auth:
@@ -142,9 +147,8 @@ class AdminManageUsers(APIView):
     permission_classes = [IsAdminUser]
 
     def get(self, request):
-        users = User.objects.all()
-        serializer = serializers.AdminSerializer(users, many=True)
-        return Response(serializer.data)
+        users = User.objects.order_by("pk")
+        return streaming_list_response(request, users, serializers.AdminSerializer)
 
     def post(self, request):
         serializer = serializers.AdminSerializer(data=request.data)
@@ -168,6 +172,12 @@ class AdminManageUsers(APIView):
     
     
     
+# Order.total and OrderLine.amount hold 12 digits, 2 of them decimals.
+AMOUNT_MAX = Decimal("1e10")
+# Items of one product per purchase; also bounds what one purchase adds to popularity.
+QUANTITY_MAX = 1000
+
+
 class PurchaseView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -177,33 +187,66 @@ class PurchaseView(APIView):
 
         if not item or not amount:
             return Response({"error": "Item and amount are required."}, status=400)
-        profile = request.user.profile
-        history = f"Purchased {item} for {amount} on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-        if profile.buy_history:
-            profile.buy_history += f"\n{history}"
-        else:
-            profile.buy_history = history
-        profile.save()
-
-        return Response({"message": "Purchase recorded successfully."}, status=201)
+        try:
+            amount = Decimal(str(amount))
+            # NaN and Infinity pass quantize() but not the comparisons below.
+            if not amount.is_finite():
+                raise InvalidOperation
+            amount = amount.quantize(Decimal("0.01"))
+            quantity = int(request.data.get("quantity", 1))
+        except (InvalidOperation, TypeError, ValueError):
+            return Response({"error": "Amount must be a number and quantity an integer."}, status=400)
+        if amount < 0 or amount >= AMOUNT_MAX or not 1 <= quantity <= QUANTITY_MAX:
+            return Response(
+                {"error": f"Amount must be between 0 and 10 billion and quantity between 1 and {QUANTITY_MAX}."},
+                status=400,
+            )
+
+        item = str(item).strip()
+        clothing_item = ClothingItem.objects.filter(pk=item).first() if item.isdigit() else None
+        item_name = clothing_item.name if clothing_item else item
+
+        # Insert-only: a purchase never rewrites earlier rows, so concurrent purchases can't lose each other.
+        # ``amount`` is what was paid for the whole line, so it is also the order total.
+        with transaction.atomic():
+            order = Order.objects.create(user=request.user, total=amount)
+            OrderLine.objects.create(
+                order=order, clothing_item=clothing_item, item_name=item_name[:255], quantity=quantity, amount=amount
+            )
+            if clothing_item is not None:
+                transaction.on_commit(lambda: popularity.record(clothing_item.pk, "purchase", quantity))
+
+        return Response({"message": "Purchase recorded successfully.", "order_id": order.pk}, status=201)
 
 
 
 class UserProfileView(APIView):
     permission_classes = [IsAuthenticated]
 
+    def get_keyset_ordering(self):
+        return ("-created_at", "-id")
+
     def get(self, request):
         try:
             profile = request.user.profile
         except Profile.DoesNotExist:
             return Response({"error": "Profile does not exist for this user."}, status=status.HTTP_404_NOT_FOUND) 
 
+        paginator = KeysetPagination()
+        orders = paginator.paginate_queryset(
+            Order.objects.filter(user=request.user).prefetch_related("lines"), request, view=self
+        )
         data = {
             "username": request.user.username,
             "email": request.user.email,
-            "buy_history": profile.buy_history,
+            "buy_history": {
+                "next": paginator.get_next_link(),
+                "previous": paginator.get_previous_link(),
+                "results": serializers.OrderSerializer(orders, many=True).data,
+            },
             "created_at": profile.created_at,
         }
         return Response(data)
     
     
+    